@@ -5,15 +5,83 @@ from typing import List
 
 class Settings(BaseSettings):
     ENVIRONMENT: str = "development"
+    METRICS_ENABLED: bool = True
+    WEB_HOST: str = "0.0.0.0"
+    WEB_PORT: int = 8000
+    WEB_CONCURRENCY: int = 1
+    PROMETHEUS_MULTIPROC_DIR: str = "/tmp/ai-agent-metrics"
     POSTGRES_USER: str
     POSTGRES_PASSWORD: SecretStr
     POSTGRES_HOST: str = "localhost"
     POSTGRES_PORT: int = 5432
     POSTGRES_DB: str
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0
+    DB_POOL_RECYCLE_SECONDS: int = 1800
     ENABLE_FORCE_SEED: bool = True
+    STARTUP_RETRY_SECONDS: int = 5
+    SEED_EMBED_BATCH_SIZE: int = 256
+    SEED_EMBED_CONCURRENCY: int = 4
+    SEED_EMBED_MAX_RETRIES: int = 5
     OPENAI_API_KEY: str | None = None
     LLM_PROVIDERS: List[str] = ["openai"]
     OPENAI_MODEL: str | None = None
+    LLM_TIMEOUT_SECONDS: float = 30.0
+    LLM_MAX_RETRIES: int = 1
+    LLM_MAX_CONNECTIONS: int = 20
+    LLM_CIRCUIT_FAILURE_THRESHOLD: int = 3
+    LLM_CIRCUIT_COOLDOWN_SECONDS: int = 30
+    LLM_HEALTH_PROBE_INTERVAL_SECONDS: int = 60
+    LLM_HEALTH_LATENCY_WINDOW: int = 200
+    FAKE_LLM_LATENCY_MS: float = 300.0
+    FAKE_LLM_TOKEN_LATENCY_MS: float = 10.0
+    RETRIEVAL_ENGINE: str = "pgvector"  # "pgvector" | "numpy"
+    VECTOR_INDEX_REFRESH_SECONDS: int = 60
+    EMBEDDING_DIMENSIONS: int = 1536
+    VECTOR_ANN_INDEX: str = "hnsw"  # "hnsw" | "ivfflat" | "none"
+    HNSW_M: int = 16
+    HNSW_EF_CONSTRUCTION: int = 64
+    HNSW_EF_SEARCH: int = 100
+    IVFFLAT_LISTS: int = 0  # 0: rows / 1000
+    IVFFLAT_PROBES: int = 10
+    VECTOR_EXACT_SEARCH_MAX_ROWS: int = 10000
+    EMBEDDING_PROVIDER: str = "openai"  # "openai" | "fake"
+    FAKE_EMBEDDING_LATENCY_MS: float = 50.0
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_PATH: str = ".cache/embeddings.sqlite3"
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 10000
+    SHARED_CACHE_ENABLED: bool = False
+    SHARED_CACHE_PATH: str = ".cache/shared.sqlite3"
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_SIMILARITY: float = 0.95
+    ANSWER_CACHE_TTL_SECONDS: int = 3600
+    ANSWER_CACHE_MAX_ENTRIES: int = 1000
+    FAQ_DIRECT_ANSWER_ENABLED: bool = True
+    FAQ_DIRECT_ANSWER_SIMILARITY: float = 0.92
+    SINGLE_FLIGHT_ENABLED: bool = True
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_PER_MINUTE: float = 30.0
+    RATE_LIMIT_BURST: int = 10
+    RATE_LIMIT_MAX_CLIENTS: int = 10000
+    TRUSTED_PROXY_HOPS: int = 1
+    LLM_MAX_CONCURRENCY: int = 8
+    LLM_QUEUE_MAX_SIZE: int = 32
+    LLM_QUEUE_TIMEOUT_SECONDS: float = 10.0
+    RETRIEVAL_MAX_CONCURRENCY: int = 8
+    RETRIEVAL_MAX_DISTANCE: float | None = None
+    PROMPT_TOKEN_BUDGET: int = 2000
+    HYBRID_SEARCH_ENABLED: bool = True
+    HYBRID_RRF_K: int = 60
+    LEXICAL_FAST_PATH_MAX_TERMS: int = 3
+    LEXICAL_FAST_PATH_MAX_TERM_SHARE: float = 0.1
+    LOG_QUEUE_MAX_SIZE: int = 10000
+    LOG_BATCH_SIZE: int = 100
+    LOG_FLUSH_INTERVAL_SECONDS: float = 1.0
+    SESSION_HISTORY_TURNS: int = 5
+    SESSION_CACHE_MAX_SESSIONS: int = 10000
+    SESSION_CACHE_TTL_SECONDS: int = 600
+    SPECULATIVE_FALLBACK: bool = True
 
     class Config:
         env_file = ".env"
@@ -1,14 +1,26 @@
+import asyncio
+import threading
 from fastapi import FastAPI
 from fastapi.responses import RedirectResponse
+from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError, OperationalError
-from app.routers import agent, health, logs
-from app.utils.db import engine, Base
+from app.routers import agent, health, logs, metrics
+from app.utils.db import engine, pool_status
 from app.utils.error_handler import register_exception_handlers  
 from app.services.vectorstore import get_all_vector_stores
 from app.utils.logging.logger import get_logger
 from fastapi.middleware.cors import CORSMiddleware
 from app.utils.init_db import init_db
+from app.services.log_service import log_writer, session_history
+from app.services.answer_cache import answer_cache
+from app.services.faq_index import faq_index
+from app.services.readiness import readiness
+from app.services.prompt_builder import load_encoding
 from app.config.settings import settings
+from app.utils.llm import get_provider_registry, run_health_prober
+from app.utils.timing import StageTimer
+from app.utils.metrics import stats_collector
+from app.utils.middleware import RequestContextMiddleware
 
 
 logger = get_logger("AI Agent")
@@ -35,8 +47,6 @@ app = FastAPI(
     openapi_url=None   
 )
 
-init_db()
-
 register_exception_handlers(app)
 
 if settings.ENVIRONMENT == "production":
@@ -54,31 +64,92 @@ app.add_middleware(
     allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
+)
+# Outermost: request IDs in every log line, request counts and latency for /metrics
+app.add_middleware(RequestContextMiddleware)
+
+stats_collector.register("answer_cache", answer_cache.stats)
+stats_collector.register("faq_index", faq_index.stats)
+stats_collector.register("single_flight", agent.ask_flights.stats)
+stats_collector.register("rate_limiter", agent.rate_limiter.stats)
+stats_collector.register("llm_admission", agent.llm_admission.stats)
+stats_collector.register("session_history", session_history.stats)
+stats_collector.register("log_writer", log_writer.stats)
+stats_collector.register("db_pool", pool_status, label="pool")
+stats_collector.register(
+    "llm_provider", lambda: {p["provider"]: p for p in get_provider_registry().status()}, label="provider"
 )
 
 
-@app.on_event("startup")
-def on_startup():
+_stop_loading = threading.Event()
+
+
+def load_backend(vector_stores: dict) -> None:
+    """
+    Load the tokenizer, wait for the database, create/migrate tables, then seed and
+    load the vector stores. Runs off the event loop so the API accepts connections right away.
+    """
+    timer = StageTimer(pipeline="startup")
+    with timer.stage("tokenizer"):
+        load_encoding()
+    while not _stop_loading.is_set():
+        try:
+            with timer.stage("db_wait"), engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            break
+        except OperationalError as e:
+            logger.warning(
+                "Database not reachable yet (%s). Retrying in %ss...",
+                str(e).split("\n")[0], settings.STARTUP_RETRY_SECONDS,
+            )
+            _stop_loading.wait(settings.STARTUP_RETRY_SECONDS)
+    if _stop_loading.is_set():
+        return
     try:
-        Base.metadata.create_all(bind=engine)
-        app.state.vector_stores = get_all_vector_stores(force=settings.ENABLE_FORCE_SEED)  
-        if app.state.vector_stores:
+        with timer.stage("init_db"):
+            init_db()
+        with timer.stage("vector_stores"):
+            get_all_vector_stores(force=settings.ENABLE_FORCE_SEED, vector_stores=vector_stores)
+        logger.info("Startup timings: %s", timer.summary())
+        if vector_stores:
             logger.info("Vector stores initialized successfully.")
         else:
             logger.warning("Vector stores not available at startup.")
     except (SQLAlchemyError, OperationalError) as e:
+        readiness.set_phase("failed")
         logger.error("Database not reachable during startup: %s", e)
-        app.state.vector_stores = {}
+    except Exception as e:
+        # Anything else (missing data folder, seeding error...) must not leave /ask at 503 forever
+        readiness.set_phase("failed")
+        logger.error("Startup failed: %s", e, exc_info=True)
+
+
+@app.on_event("startup")
+async def on_startup():
+    # Build LLM clients once; requests reuse their pooled connections
+    get_provider_registry()
+    log_writer.start()
+    app.state.llm_health_prober = asyncio.create_task(run_health_prober())
+    # Filled in place by the loader; /ask answers 503 until a collection is ready
+    app.state.vector_stores = {}
+    threading.Thread(
+        target=load_backend, args=(app.state.vector_stores,), name="startup-loader", daemon=True
+    ).start()
 
 @app.on_event("shutdown")
-def on_shutdown():
-    # If needed → close connections, cleanup, etc.
-    pass
+async def on_shutdown():
+    _stop_loading.set()
+    app.state.llm_health_prober.cancel()
+    await asyncio.to_thread(log_writer.stop)
+    await get_provider_registry().aclose()
 
 # Register routers
 app.include_router(agent.router, prefix="/api/v1", tags=["Agent"])
 app.include_router(health.router, prefix="/api/v1", tags=["Health"])
 # app.include_router(logs.router, prefix="/api/v1", tags=["Logs"])
+if settings.METRICS_ENABLED:
+    app.include_router(metrics.router, tags=["Metrics"])
 
 
 # Redirect root to Swagger UI
@@ -1,12 +1,17 @@
-from sqlalchemy import Column, Integer, Text, TIMESTAMP, func, String
+from sqlalchemy import Column, Index, Integer, Text, TIMESTAMP, func, String
 from app.utils.db import Base 
 
 class AgentLog(Base):
     __tablename__ = "agent_logs"
 
     id = Column(Integer, primary_key=True, index=True)
-    session_id = Column(String, nullable=False, index=True)
+    session_id = Column(String, nullable=False)
     question = Column(Text, nullable=False)
     answer = Column(Text, nullable=False)
     ip_address = Column(String(45)) 
     created_at = Column(TIMESTAMP, server_default=func.now())
+
+    # Kept in sync with migration 1 in app/utils/migrations.py
+    __table_args__ = (
+        Index("ix_agent_logs_session_created", session_id, created_at.desc()),
+    )
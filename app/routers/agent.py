@@ -1,131 +1,466 @@
-from fastapi import APIRouter, Request
-from app.services.log_service import save_log, get_last_messages
+import asyncio
+import json
+from dataclasses import dataclass, field
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from app.services.log_service import HistoryTurn, save_log, aget_last_messages
+from app.services.retrieval import aembed_query, aretrieve, asearch_lexical, language_collections
+from app.services.answer_cache import answer_cache
+from app.services.faq_index import faq_index, normalize_question
+from app.services.readiness import readiness
+from app.services.vectorstore import hybrid_search_enabled
+from app.services.prompt_builder import build_prompt
 from app.utils.llm import get_chat_model
+from app.config.settings import settings
 from app.schemas import AgentQuery, AgentResponse, AgentAnswer, ErrorResponse
+from app.utils.admission import AdmissionQueue, TokenBucketLimiter
 from app.utils.logging.logger import get_logger
+from app.utils.single_flight import SingleFlight
+from app.utils.timing import StageTimer
+from app.utils.metrics import ASK_OUTCOMES, PROMPT_TOKENS, record_llm_usage
 
 
 logger = get_logger("AI Agent")
 
 router = APIRouter(tags=["Agent"])
 
+# Concurrent /ask calls for the same (language, normalized question, corpus version) from sessions without previous turns
+ask_flights = SingleFlight(enabled=settings.SINGLE_FLIGHT_ENABLED)
+
+# Per-client request budget and the bounded queue in front of the chat model
+rate_limiter = TokenBucketLimiter(
+    enabled=settings.RATE_LIMIT_ENABLED,
+    per_minute=settings.RATE_LIMIT_PER_MINUTE,
+    burst=settings.RATE_LIMIT_BURST,
+    max_clients=settings.RATE_LIMIT_MAX_CLIENTS,
+)
+llm_admission = AdmissionQueue(
+    max_concurrency=settings.LLM_MAX_CONCURRENCY,
+    max_waiting=settings.LLM_QUEUE_MAX_SIZE,
+    max_wait_seconds=settings.LLM_QUEUE_TIMEOUT_SECONDS,
+)
+
+NOT_FOUND_REPLY = "I couldn’t find that information in Jorge’s profile. Please ask about his background, education, experience, or skills."
+ERROR_REPLY = (
+    "I couldn’t process your request due to a technical issue. "
+    "Please try again later or ask about Jorge’s background, education, experience, or skills."
+)
+
+
+@dataclass
+class PreparedAsk:
+    """Outcome of the retrieval stage shared by /ask and /ask/stream."""
+    session_id: str
+    question: str
+    lang: str
+    client_ip: str
+    timer: StageTimer
+    answer: Optional[str] = None  # set when no LLM call is needed (cache hit / nothing found)
+    cached: bool = False
+    faq: bool = False
+    coalesced: bool = False  # answer shared with a concurrent identical request
+    source: Optional[str] = None
+    used_fallback: bool = False
+    lexical_only: bool = False
+    prompt_tokens: Optional[int] = None
+    query_vector: Optional[List[float]] = None
+    history: Optional[List[HistoryTurn]] = None  # the session's previous turns, once fetched
+    chat_history: List[dict] = field(default_factory=list)
+    # Started together by `_begin_ask`; the embedding may still run after the lexical fast path
+    history_task: Optional["asyncio.Task"] = None
+    embed_task: Optional["asyncio.Task"] = None
+    lexical_task: Optional["asyncio.Task"] = None
+
+    @property
+    def standalone(self) -> bool:
+        """No previous turns, so the answer depends on the question alone (cacheable)."""
+        return not self.history
+
+    def cancel_tasks(self) -> None:
+        for task in (self.history_task, self.embed_task, self.lexical_task):
+            if task:
+                task.cancel()
+
+
+async def _fetch_history(prepared: PreparedAsk) -> List[HistoryTurn]:
+    if prepared.history is None:
+        prepared.history = await aget_last_messages(prepared.session_id)
+    return prepared.history
+
+
+def _rate_limit_key(request: Request) -> str:
+    """
+    The client address as seen by the outermost trusted proxy: with `TRUSTED_PROXY_HOPS`
+    proxies in front, the X-Forwarded-For entry it appended (anything before it is
+    client-supplied); otherwise the peer address.
+    """
+    hops = settings.TRUSTED_PROXY_HOPS
+    forwarded = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+    if hops > 0 and len(forwarded) >= hops:
+        return forwarded[-hops]
+    return request.client.host
+
+
+def _start_ask(query: AgentQuery, request: Request) -> PreparedAsk:
+    """
+    Validate the request (503 while the vector stores load, 429 once the client's
+    rate limit is spent) and start its timer.
+    """
+    client_ip = request.headers.get("x-forwarded-for", request.client.host)
+    lang = (query.language or "en").lower()
+    if lang not in ["en", "es", "fr"]:
+        logger.warning(f"Unsupported language '{lang}', defaulting to English.")
+        lang = "en"
+
+    if not readiness.serving:
+        raise HTTPException(
+            status_code=503,
+            detail="Vector store not available",
+            headers={"Retry-After": str(settings.STARTUP_RETRY_SECONDS)},
+        )
+    rate_limiter.check(_rate_limit_key(request))
+
+    return PreparedAsk(
+        session_id=query.session_id,
+        question=query.question.strip(),
+        lang=lang,
+        client_ip=client_ip,
+        timer=StageTimer(pipeline="ask"),
+    )
+
+
+def _begin_ask(prepared: PreparedAsk, vector_stores: dict) -> PreparedAsk:
+    """
+    Answer exact FAQ questions directly; otherwise start fetching the session history,
+    embedding the question and the full-text search, which are independent.
+    """
+    with prepared.timer.stage("faq"):
+        faq = faq_index.match_text(prepared.lang, prepared.question)
+    if faq:
+        prepared.answer = faq.answer
+        prepared.faq = True
+        return prepared
+
+    prepared.history_task = asyncio.create_task(_fetch_history(prepared))
+    if vector_stores:
+        prepared.embed_task = asyncio.create_task(aembed_query(prepared.question))
+    if vector_stores and hybrid_search_enabled():
+        prepared.lexical_task = asyncio.create_task(
+            asearch_lexical(language_collections(prepared.lang), prepared.question, prepared.lang)
+        )
+    return prepared
+
+
+async def _prepare_ask(prepared: PreparedAsk, vector_stores: dict) -> PreparedAsk:
+    """
+    After `_begin_ask`: answer FAQ questions directly, otherwise consult the answer
+    cache, retrieve context and build the chat history. The answer cache only serves
+    sessions without previous turns, whose answers don't depend on a conversation.
+    """
+    if prepared.answer is not None:
+        return prepared
+    question = prepared.question
+    lang = prepared.lang
+    timer = prepared.timer
+    history_task = prepared.history_task
+    embed_task = prepared.embed_task
+    lexical_task = prepared.lexical_task
+
+    best_docs = []
+    lexical = None
+
+    if lexical_task:
+        # Short questions may be answered from keyword hits alone; the embedding runs meanwhile
+        if len(question.split()) <= 2 * settings.LEXICAL_FAST_PATH_MAX_TERMS:
+            with timer.stage("lexical"):
+                lexical = await lexical_task
+            fast = lexical.fast_path(k=4)
+            if fast:
+                with timer.stage("history"):
+                    await history_task
+                cached = None
+                if prepared.standalone:
+                    with timer.stage("answer_cache"):
+                        cached = await answer_cache.alookup_text(lang, question)
+                if cached:
+                    embed_task.cancel()
+                    prepared.answer = cached.answer
+                    prepared.cached = True
+                    return prepared
+                best_docs, prepared.source = fast
+                # The embedding is not awaited: it finishes during the model call and keys the cached answer
+                prepared.lexical_only = True
+
+    if embed_task and not prepared.lexical_only:
+        with timer.stage("embed"):
+            prepared.query_vector = await embed_task
+
+        with timer.stage("faq"):
+            faq = await faq_index.amatch_vector(lang, prepared.query_vector)
+        if faq:
+            history_task.cancel()
+            if lexical_task:
+                lexical_task.cancel()
+            logger.info("FAQ direct hit (similarity %.3f): %s", faq.similarity, faq.question)
+            prepared.answer = faq.answer
+            prepared.faq = True
+            return prepared
+
+        with timer.stage("history"):
+            await history_task
+        cached = None
+        if prepared.standalone:
+            with timer.stage("answer_cache"):
+                cached = await answer_cache.alookup(lang, prepared.query_vector)
+        if cached:
+            if lexical_task:
+                lexical_task.cancel()
+            prepared.answer = cached.answer
+            prepared.cached = True
+            return prepared
+
+        if lexical is None and lexical_task:
+            with timer.stage("lexical"):
+                lexical = await lexical_task
+        with timer.stage("search"):
+            best_docs, prepared.source, prepared.used_fallback = await aretrieve(
+                vector_stores, lang, prepared.query_vector, lexical=lexical
+            )
+        if prepared.used_fallback:
+            logger.warning(f"No results found for language '{lang}'. Falling back to English collections.")
+
+    if not best_docs:
+        history_task.cancel()
+        prepared.answer = NOT_FOUND_REPLY
+        return prepared
+
+    with timer.stage("history"):
+        previous_logs = await history_task
+    prompt = build_prompt(lang, question, best_docs, previous_logs, source=prepared.source)
+    prepared.prompt_tokens = prompt.prompt_tokens
+    PROMPT_TOKENS.observe(prompt.prompt_tokens)
+    logger.info(
+        "Prompt: %s tokens (%s chunks, %s history turns).",
+        prompt.prompt_tokens, prompt.chunks_used, prompt.turns_used,
+    )
+    prepared.chat_history = prompt.messages
+    return prepared
+
+
+def _outcome(prepared: PreparedAsk, answer: str) -> str:
+    if prepared.coalesced:
+        return "coalesced"
+    if prepared.faq:
+        return "faq"
+    if prepared.cached:
+        return "cache_hit"
+    if answer == ERROR_REPLY:
+        return "error"
+    if prepared.answer == NOT_FOUND_REPLY:
+        return "not_found"
+    return "lexical" if prepared.lexical_only else "answered"
+
+
+def _shortcut_label(prepared: PreparedAsk) -> str:
+    if prepared.coalesced:
+        return "Coalesced with an identical request. "
+    if prepared.faq:
+        return "FAQ direct answer. "
+    return "Answer cache hit. " if prepared.cached else ""
+
+
+async def _cache_answer(prepared: PreparedAsk, answer: str) -> None:
+    """Store the answer of a session without previous turns, keyed by the question's embedding."""
+    if not prepared.standalone:
+        return
+    if prepared.query_vector is None and prepared.embed_task is not None:
+        try:
+            prepared.query_vector = await prepared.embed_task
+        except Exception as e:
+            logger.warning("Question embedding failed, answer not cached: %s", str(e).split("\n")[0])
+            return
+    answer_cache.store(prepared.lang, prepared.question, prepared.query_vector, answer)
+
+
+def _save(prepared: PreparedAsk, answer: str) -> None:
+    ASK_OUTCOMES.labels(_outcome(prepared, answer)).inc()
+    with prepared.timer.stage("save_log"):
+        save_log(
+            session_id=prepared.session_id,
+            question=prepared.question,
+            answer=answer,
+            client_ip=prepared.client_ip
+            )
+
+
+async def _answer(prepared: PreparedAsk, vector_stores: dict) -> str:
+    """
+    Retrieval and the model call of one /ask computation (shared by coalesced requests),
+    after `_begin_ask`. Returns ERROR_REPLY if the model fails; raises 429 if no model
+    slot frees up in time.
+    """
+    await _prepare_ask(prepared, vector_stores)
+    if prepared.answer is not None:
+        return prepared.answer
+
+    with prepared.timer.stage("llm_queue"):
+        release = await llm_admission.acquire()
+    chat_model = get_chat_model()
+    try:
+        with prepared.timer.stage("llm"):
+            answer = await chat_model.ainvoke(prepared.chat_history)
+        usage = getattr(answer, "usage_metadata", None)
+        record_llm_usage(usage)
+        if usage:
+            logger.info("LLM usage: prompt=%s completion=%s tokens.", usage.get("input_tokens"), usage.get("output_tokens"))
+    except Exception as e:
+        logger.error("Chat model invocation failed: %s", e, exc_info=True)
+        if prepared.embed_task:
+            prepared.embed_task.cancel()
+        return ERROR_REPLY
+    finally:
+        release()
+    await _cache_answer(prepared, answer.content)
+    return answer.content
+
+
 @router.post(
     "/ask",
     summary="Ask Jorge’s AI Agent",
     response_model=AgentResponse,
     responses={
         200: {"description": "Successful answer", "model": AgentResponse},
+        429: {"description": "Rate limit exceeded or model queue full", "model": ErrorResponse},
         503: {"description": "Vector store not available", "model": ErrorResponse},
         500: {"description": "Unexpected error", "model": ErrorResponse},
     }
 )
 
 
-def ask_document(query: AgentQuery, request: Request):
+async def ask_document(query: AgentQuery, request: Request):
     """
     Ask a question to Jorge's AI Agent.
 
     - Searches across ALL loaded vector collections (cv, faq, etc.).
     - If the answer isn't found in any, responds politely.
+    - FAQ questions get their stored answer directly, without calling the model.
+    - Runs fully async; the session history is fetched while the question is embedded.
+    - Identical questions (same language and corpus) asked concurrently by sessions
+      without previous turns share one computation; each request is still logged
+      under its own session. Follow-ups depend on their conversation, so they never do.
+    - Answers 503 with `Retry-After` while the vector stores are still loading.
+    - Answers 429 with `Retry-After` when the client exceeds its rate limit, or when
+      the model is saturated and its wait queue is full (instead of timing out).
     """
-    client_ip = request.headers.get("x-forwarded-for", request.client.host)
-    session_id = query.session_id
-    lang = (query.language or "en").lower()
-    if lang not in ["en", "es", "fr"]:
-        logger.warning(f"Unsupported language '{lang}', defaulting to English.")
-        lang = "en"
+    vector_stores = request.app.state.vector_stores
+    prepared = _begin_ask(_start_ask(query, request), vector_stores)
+    if prepared.history_task:
+        # Embedding and full-text search are already running
+        with prepared.timer.stage("history"):
+            await prepared.history_task
+    if prepared.standalone:
+        key = (prepared.lang, normalize_question(prepared.question), answer_cache.corpus_version)
+        if ask_flights.in_flight(key):
+            prepared.cancel_tasks()  # the leader's computation answers this one
+        answer, prepared.coalesced = await ask_flights.run(key, lambda: _answer(prepared, vector_stores))
+    else:
+        answer = await _answer(prepared, vector_stores)
+    if prepared.coalesced:
+        prepared.timer.mark("coalesced")
+
+    _save(prepared, answer)
+    logger.info("%sAsk timings: %s", _shortcut_label(prepared), prepared.timer.summary())
+    return AgentResponse(data=AgentAnswer(question=prepared.question, answer=answer))
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
 
+
+@router.post(
+    "/ask/stream",
+    summary="Ask Jorge’s AI Agent (streamed)",
+    response_class=StreamingResponse,
+    responses={
+        200: {"description": "Server-Sent Events stream", "content": {"text/event-stream": {}}},
+        429: {"description": "Rate limit exceeded or model queue full", "model": ErrorResponse},
+        503: {"description": "Vector store not available", "model": ErrorResponse},
+        500: {"description": "Unexpected error", "model": ErrorResponse},
+    }
+)
+async def ask_document_stream(query: AgentQuery, request: Request):
+    """
+    Same as `/ask`, but streams the answer as Server-Sent Events.
+
+    - `metadata`: question, language, source collection, whether the answer came from cache
+      or straight from the FAQ, whether retrieval took the lexical fast path and the prompt size in tokens.
+    - `token`: one event per chunk produced by the model.
+    - `done`: the full answer, sent once it has been saved to the logs.
+    - `error`: sent instead of `done` if the model fails mid-stream.
+
+    The model slot is taken before the stream starts, so overload is still a plain 429.
+    """
     vector_stores = request.app.state.vector_stores
-    best_docs = []
-    collections = [f"cv_{lang}_embeddings", f"faq_{lang}_embeddings"]
-
-    question = query.question.strip()
-
-    best_source = None
-    best_score = 0
-
-    for collection_name in collections:
-        vector_store = vector_stores.get(collection_name)
-        if vector_store:
-            results = vector_store.similarity_search_with_score(question, k=4)
-            if results:
-                avg_score = sum(score for _, score in results) / len(results)
-                if best_docs == [] or avg_score < best_score:
-                    best_docs = [doc for doc, _ in results]
-                    best_score = avg_score
-                    best_source = collection_name
-
-    if not best_docs and lang != "en":
-        logger.warning(f"No results found for language '{lang}'. Falling back to English collections.")
-        for collection_name in ["cv_en_embeddings", "faq_en_embeddings"]:
-            vector_store = vector_stores.get(collection_name)
-            if vector_store:
-                results = vector_store.similarity_search_with_score(question, k=4)
-                if results:
-                    avg_score = sum(score for _, score in results) / len(results)
-                    if best_docs == [] or avg_score < best_score:
-                        best_docs = [doc for doc, _ in results]
-                        best_score = avg_score
-                        best_source = collection_name
+    prepared = await _prepare_ask(_begin_ask(_start_ask(query, request), vector_stores), vector_stores)
+    release = None
+    if prepared.answer is None:
+        with prepared.timer.stage("llm_queue"):
+            release = await llm_admission.acquire()
 
-    if not best_docs:
-        fallback = "I couldn’t find that information in Jorge’s profile. Please ask about his background, education, experience, or skills."
-        save_log(session_id=session_id, question=question, answer=fallback, client_ip=client_ip)
-        return AgentResponse(data=AgentAnswer(question=question, answer=fallback))
+    async def event_stream():
+        timer = prepared.timer
+        yield _sse("metadata", {
+            "question": prepared.question,
+            "language": prepared.lang,
+            "source": prepared.source,
+            "cached": prepared.cached,
+            "faq": prepared.faq,
+            "fallback": prepared.used_fallback,
+            "lexical": prepared.lexical_only,
+            "prompt_tokens": prepared.prompt_tokens,
+        })
 
-    context = "\n\n---\n\n".join(
-        f"[source: {best_source}]\n{doc.page_content}" for doc in best_docs
-    )
+        if prepared.answer is not None:
+            yield _sse("token", {"token": prepared.answer})
+            _save(prepared, prepared.answer)
+            logger.info("Stream timings: %s", timer.summary())
+            yield _sse("done", {"answer": prepared.answer})
+            return
 
-    chat_model = get_chat_model()
-    chat_history = [
-        {
-            "role": "system",
-            "content": (
-                f"You are a helpful assistant. You must always answer strictly in {lang.upper()}.\n\n"
-                "You are a helpful assistant that answers questions using ONLY the following context blocks.\n\n"
-                "Each block starts with [source: cv] or [source: faq]. Use the information in these blocks to answer the user question.\n\n"
-                "Do NOT use any prior knowledge, facts, or general information. Your answer MUST be based strictly on the provided context blocks.\n\n"
-                "If the answer is not found explicitly in the context, respond exactly with:\n"
-                "\"I couldn’t find that information in Jorge’s profile. Please ask about his background, education, experience, or skills.\"\n\n"
-                "Give priority to blocks marked as [source: faq] if the question is about preferences, opinions, or personal logistics (e.g., salary, availability, goals, etc.).\n\n"
-                f"You must always answer in {lang.upper()}.\n\n"   
-                f"{context}"
-            )
-        }
-    ]
-
-    previous_logs = get_last_messages(session_id)
-    for log in previous_logs:
-        chat_history.append({"role": "user", "content": log.question})
-        chat_history.append({"role": "assistant", "content": log.answer})
-    chat_history.append({"role": "user", "content": question})
-    try:
-        answer = chat_model.invoke(chat_history)
+        chat_model = get_chat_model()
+        parts: List[str] = []
+        usage = None
+        try:
+            with timer.stage("llm"):
+                async for chunk in chat_model.astream(prepared.chat_history):
+                    usage = getattr(chunk, "usage_metadata", None) or usage  # sent with the last chunk
+                    if chunk.content:
+                        if not parts:
+                            timer.mark("first_token")
+                        parts.append(chunk.content)
+                        yield _sse("token", {"token": chunk.content})
+        except Exception as e:
+            logger.error("Chat model streaming failed: %s", e, exc_info=True)
+            if prepared.embed_task:
+                prepared.embed_task.cancel()
+            _save(prepared, ERROR_REPLY)
+            yield _sse("error", {"message": ERROR_REPLY})
+            return
+        finally:
+            release()
 
-        save_log(
-            session_id=session_id,
-            question=question, 
-            answer=answer.content, 
-            client_ip=client_ip
-            )
-        return AgentResponse(
-            data=AgentAnswer(
-                question=question, 
-                answer=answer.content
-                )
-        )
-    except Exception as e:
-        logger.error("Chat model invocation failed: %s", e, exc_info=True)
-        reply = (
-            "I couldn’t process your request due to a technical issue. "
-            "Please try again later or ask about Jorge’s background, education, experience, or skills."
-        )
-        save_log(
-            session_id=session_id, 
-            question=question, 
-            answer=reply, 
-            client_ip=client_ip)
-        return AgentResponse(
-            data=AgentAnswer(question=question, answer=reply)
-            )
\ No newline at end of file
+        record_llm_usage(usage)
+        answer = "".join(parts)
+        await _cache_answer(prepared, answer)
+        _save(prepared, answer)
+        logger.info("Stream timings: %s", timer.summary())
+        yield _sse("done", {"answer": answer})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(release) if release else None,  # in case the stream never starts
+    )
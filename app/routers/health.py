@@ -1,7 +1,12 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
 from app.schemas import HealthResponse, HealthData, ErrorResponse, SuccessResponse
 from app.utils.logging.logger import get_logger
 from app.utils.llm import get_chat_status
+from app.services.answer_cache import answer_cache
+from app.services.faq_index import faq_index
+from app.services.log_service import log_writer, session_history
+from app.services.readiness import readiness
+from app.utils.db import pool_status
 
 logger = get_logger("AI Agent")
 router = APIRouter(tags=["Health"])
@@ -20,11 +25,13 @@ def health():
     """
     Verify that the API is alive and connected.
 
-    - Returns a JSON response with `status=success` and `data={"status": "ok"}`.
+    - Returns a JSON response with `status=success` and `data={"status": "ok", ...}`.
+    - `ready` turns true once every vector store has loaded; `phase` and `collections`
+      show the background startup progress (pending / ready / failed per collection).
     - Monitoring tools or load balancers can use this for health checks.
     """
     try:
-        return HealthResponse(data=HealthData(status="ok"))
+        return HealthResponse(data=HealthData(status="ok", ready=readiness.ready, **readiness.snapshot()))
     except Exception as e:
         logger.error("Failed to fetch status: %s", str(e).split("\n")[0])
         return ErrorResponse(
@@ -45,6 +52,10 @@ def ai_health_check():
     """
     Checks the availability of the LLM providers (OpenAI, OpenRouter, Gemini).
     Returns 'online' or 'offline' plus provider info.
+
+    - Answers from cached state kept by a background prober and by real /ask traffic,
+      so polling it costs no tokens and no provider round-trip.
+    - Includes the last check timestamp and recent latency percentiles.
     """
     try:
         status_info = get_chat_status()  
@@ -53,14 +64,61 @@ def ai_health_check():
             return HealthResponse(data=status_info)
         else:
             logger.warning("LLM service reported as offline.")
-            return ErrorResponse(
-                status="error",
-                error={"code": 503, "message": "LLM service unavailable"}
-            )
+            raise HTTPException(status_code=503, detail="LLM service unavailable")
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error("LLM health check failed: %s", str(e).split("\n")[0])
         return ErrorResponse(
             status="error",
             error={"code": 500, "message": "Unexpected error in LLM health check"}
-        )
\ No newline at end of file
+        )
+
+
+@router.get(
+    "/health/cache",
+    summary="Answer cache statistics",
+    response_model=SuccessResponse,
+    responses={
+        200: {"description": "Answer cache counters", "model": SuccessResponse},
+    }
+)
+def cache_stats():
+    """
+    Report the semantic answer cache counters (entries, hits, misses, hit rate),
+    the corpus version the cached answers belong to, and the FAQ direct-answer counters.
+    """
+    return SuccessResponse(data={**answer_cache.stats(), "faq": faq_index.stats()})
+
+
+@router.get(
+    "/health/logs",
+    summary="Interaction log writer statistics",
+    response_model=SuccessResponse,
+    responses={
+        200: {"description": "Log writer counters", "model": SuccessResponse},
+    }
+)
+def log_writer_stats():
+    """
+    Report the background log writer counters (queued, enqueued, flushed, dropped, failed)
+    and the session history cache usage.
+    """
+    return SuccessResponse(data={**log_writer.stats(), "session_history": session_history.stats()})
+
+
+@router.get(
+    "/health/db",
+    summary="Database connection pool statistics",
+    response_model=SuccessResponse,
+    responses={
+        200: {"description": "Pool usage and wait times", "model": SuccessResponse},
+    }
+)
+def db_pool_stats():
+    """
+    Report the sync and async connection pools: size, checked-out and overflow
+    connections, plus checkout wait times (avg/max) and timeouts since startup.
+    """
+    return SuccessResponse(data=pool_status())
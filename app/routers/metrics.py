@@ -0,0 +1,15 @@
+from fastapi import APIRouter, Response
+from app.utils.metrics import render_metrics
+
+router = APIRouter(tags=["Metrics"])
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    """
+    Prometheus exposition: HTTP request counts and latency, per-stage latency
+    histograms (ask, seed, startup, health), LLM token usage, /ask outcomes and
+    cache, log writer and connection pool statistics.
+    """
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
@@ -1,9 +1,15 @@
 from pydantic import BaseModel
+from typing import Dict, Optional
 
 class HealthData(BaseModel):
     """Schema for health data inside success response"""
     status: str
     provider: str | None = None
+    last_check: Optional[str] = None
+    latency_ms: Optional[Dict[str, float]] = None
+    ready: Optional[bool] = None
+    phase: Optional[str] = None
+    collections: Optional[Dict[str, str]] = None
 
 class HealthResponse(BaseModel):
     """Typed response for health endpoint"""
@@ -0,0 +1,38 @@
+"""
+Production entrypoint: `python -m app.server`.
+
+Runs `WEB_CONCURRENCY` uvicorn worker processes. With more than one worker the
+caches are shared through `SHARED_CACHE_PATH` (unless `SHARED_CACHE_ENABLED` is set
+explicitly, in the environment or `.env`) and Prometheus runs in multiprocess mode, so /metrics covers every
+worker. Seeding is serialized across workers by a Postgres advisory lock.
+"""
+import os
+import shutil
+import uvicorn
+from app.config.settings import settings
+from app.utils.logging.logger import get_logger
+
+
+logger = get_logger("AI Agent")
+
+
+def main() -> None:
+    workers = max(1, settings.WEB_CONCURRENCY)
+    shared_caches = settings.SHARED_CACHE_ENABLED
+    if workers > 1:
+        # Workers are new processes and read these when they import the app
+        if "SHARED_CACHE_ENABLED" not in settings.model_fields_set:  # not set in the environment or .env
+            shared_caches = True
+            os.environ["SHARED_CACHE_ENABLED"] = "true"
+        metrics_dir = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", settings.PROMETHEUS_MULTIPROC_DIR)
+        shutil.rmtree(metrics_dir, ignore_errors=True)  # stale files of a previous run
+        os.makedirs(metrics_dir, exist_ok=True)
+    logger.info(
+        "Starting %s worker(s) on %s:%s (shared caches: %s).",
+        workers, settings.WEB_HOST, settings.WEB_PORT, shared_caches,
+    )
+    uvicorn.run("app.main:app", host=settings.WEB_HOST, port=settings.WEB_PORT, workers=workers)
+
+
+if __name__ == "__main__":
+    main()
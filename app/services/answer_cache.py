@@ -0,0 +1,298 @@
+import asyncio
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+import numpy as np
+from app.config.settings import settings
+from app.utils.logging.logger import get_logger
+from app.utils.shared_cache import PRUNE_EVERY_WRITES, connect_shared, immediate, io_thread
+
+
+logger = get_logger("AI Agent")
+
+
+@dataclass
+class CachedAnswer:
+    lang: str
+    question: str
+    answer: str
+    vector: np.ndarray  # unit-normalized question embedding
+    created_at: float
+
+
+class AnswerCache:
+    """
+    Semantic cache of /ask answers.
+
+    An entry is reused when a new question in the same language has a cosine
+    similarity >= `similarity_threshold` with a cached question. Entries expire
+    after `ttl_seconds`, the least recently used ones are evicted beyond
+    `max_entries`, and everything is dropped when the corpus version changes.
+    Callers only store and look up answers of sessions without previous turns,
+    since those are the answers that depend on the question alone.
+    """
+
+    def __init__(self, enabled: bool, similarity_threshold: float, ttl_seconds: int, max_entries: int):
+        self.enabled = enabled
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.corpus_version: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, str], CachedAnswer]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vector: Optional[List[float]]) -> Optional[np.ndarray]:
+        if vector is None:  # lexical fast path answers are not embedded
+            return None
+        array = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(array))
+        return array / norm if norm else None
+
+    def _purge_expired(self, now: float) -> None:
+        expired = [key for key, entry in self._entries.items() if now - entry.created_at > self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+
+    def lookup(self, lang: str, vector: List[float]) -> Optional[CachedAnswer]:
+        if not self.enabled:
+            return None
+        query = self._normalize(vector)
+        with self._lock:
+            self._purge_expired(time.time())
+            candidates = [(key, entry) for key, entry in self._entries.items() if entry.lang == lang]
+            if query is not None and candidates:
+                similarities = np.stack([entry.vector for _, entry in candidates]) @ query
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.similarity_threshold:
+                    key, entry = candidates[best]
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry
+            self.misses += 1
+            return None
+
+    async def alookup(self, lang: str, vector: List[float]) -> Optional[CachedAnswer]:
+        """`lookup` for the event loop (the shared cache reads its file in its I/O thread)."""
+        return self.lookup(lang, vector)
+
+    def lookup_text(self, lang: str, question: str) -> Optional[CachedAnswer]:
+        """Entry stored for this very question (ignoring case), for use before it is embedded."""
+        if not self.enabled:
+            return None
+        key = (lang, question.strip().lower())
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.time() - entry.created_at > self.ttl_seconds:
+                return None  # not a miss yet: the similarity lookup may still hit
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    async def alookup_text(self, lang: str, question: str) -> Optional[CachedAnswer]:
+        return self.lookup_text(lang, question)
+
+    def store(self, lang: str, question: str, vector: List[float], answer: str) -> None:
+        if not self.enabled:
+            return
+        normalized = self._normalize(vector)
+        if normalized is None:
+            return
+        key = (lang, question.strip().lower())
+        with self._lock:
+            self._entries[key] = CachedAnswer(lang, question, answer, normalized, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self, reason: str = "") -> None:
+        with self._lock:
+            if self._entries:
+                logger.info("Answer cache cleared (%s entries). %s", len(self._entries), reason)
+            self._entries.clear()
+
+    def set_corpus_version(self, version: Optional[str]) -> None:
+        """Record the current corpus version, invalidating the cache if it changed."""
+        if version != self.corpus_version:
+            self.clear(f"Corpus version changed to {version}.")
+            self.corpus_version = version
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "corpus_version": self.corpus_version,
+        }
+
+
+class SharedAnswerCache(AnswerCache):
+    """
+    AnswerCache whose entries live in a SQLite file shared by all worker processes.
+
+    Each worker keeps its in-memory entries as a mirror and, before every lookup,
+    pulls the rows other workers added since its last sync. Clearing bumps a shared
+    generation so every worker drops its mirror. The corpus version is stored in the
+    file as well, so a worker that (re)starts doesn't wipe the warm entries.
+    `alookup` and the writes of `store` run in the cache's I/O thread, never on the
+    event loop; expired and surplus rows are pruned every `PRUNE_EVERY_WRITES` writes.
+    """
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(**kwargs)
+        self._conn = connect_shared(path)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS answer_cache (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                lang TEXT NOT NULL,
+                key TEXT NOT NULL,
+                question TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ix_answer_cache_key ON answer_cache (lang, key);
+            CREATE TABLE IF NOT EXISTS answer_cache_meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        self._seen_id = 0
+        self._generation: Optional[str] = None
+        self._io = io_thread("shared-answer-cache")
+        self._writes = 0
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM answer_cache_meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _sync(self) -> None:
+        """Pull entries added by other workers (call with `_lock` held)."""
+        generation = self._meta("generation")
+        if generation != self._generation:
+            self._entries.clear()
+            self._seen_id = 0
+            self._generation = generation
+        rows = self._conn.execute(
+            "SELECT id, lang, key, question, answer, vector, created_at FROM answer_cache WHERE id > ? ORDER BY id",
+            (self._seen_id,),
+        ).fetchall()
+        for row_id, lang, key, question, answer, vector, created_at in rows:
+            self._entries[(lang, key)] = CachedAnswer(
+                lang, question, answer, np.frombuffer(vector, dtype=np.float32), created_at
+            )
+            self._entries.move_to_end((lang, key))
+            self._seen_id = row_id
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _pull(self) -> None:
+        try:
+            with self._lock:
+                self._sync()
+        except sqlite3.Error as e:
+            logger.warning("Shared answer cache unavailable, using local entries: %s", e)
+
+    def lookup(self, lang: str, vector: List[float]) -> Optional[CachedAnswer]:
+        if not self.enabled:
+            return None
+        self._pull()
+        return super().lookup(lang, vector)
+
+    def lookup_text(self, lang: str, question: str) -> Optional[CachedAnswer]:
+        if not self.enabled:
+            return None
+        self._pull()
+        return super().lookup_text(lang, question)
+
+    async def alookup(self, lang: str, vector: List[float]) -> Optional[CachedAnswer]:
+        if not self.enabled:
+            return None
+        return await asyncio.get_running_loop().run_in_executor(self._io, self.lookup, lang, vector)
+
+    async def alookup_text(self, lang: str, question: str) -> Optional[CachedAnswer]:
+        if not self.enabled:
+            return None
+        return await asyncio.get_running_loop().run_in_executor(self._io, self.lookup_text, lang, question)
+
+    def store(self, lang: str, question: str, vector: List[float], answer: str) -> None:
+        """Store locally right away; the shared row is written in the I/O thread."""
+        super().store(lang, question, vector, answer)
+        normalized = self._normalize(vector) if self.enabled else None
+        if normalized is None:
+            return
+        self._io.submit(self._share, lang, question, normalized, answer, time.time())
+
+    def _share(self, lang: str, question: str, normalized: np.ndarray, answer: str, now: float) -> None:
+        key = question.strip().lower()
+        self._writes += 1
+        try:
+            with self._lock, immediate(self._conn) as conn:
+                conn.execute("DELETE FROM answer_cache WHERE lang = ? AND key = ?", (lang, key))
+                conn.execute(
+                    "INSERT INTO answer_cache (lang, key, question, answer, vector, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (lang, key, question, answer, normalized.astype(np.float32).tobytes(), now),
+                )
+                if self._writes % PRUNE_EVERY_WRITES == 0:
+                    conn.execute("DELETE FROM answer_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+                    conn.execute(
+                        "DELETE FROM answer_cache WHERE id IN ("
+                        " SELECT id FROM answer_cache ORDER BY id DESC LIMIT -1 OFFSET ?)",
+                        (self.max_entries,),
+                    )
+        except sqlite3.Error as e:
+            logger.warning("Failed to share answer cache entry: %s", e)
+
+    def clear(self, reason: str = "") -> None:
+        """Called from background threads; waits for the entries queued before it."""
+        super().clear(reason)
+        self._io.submit(self._clear_shared).result()
+
+    def _clear_shared(self) -> None:
+        try:
+            with self._lock, immediate(self._conn) as conn:
+                conn.execute("DELETE FROM answer_cache")
+                self._generation = uuid.uuid4().hex
+                conn.execute(
+                    "INSERT OR REPLACE INTO answer_cache_meta (key, value) VALUES ('generation', ?)",
+                    (self._generation,),
+                )
+        except sqlite3.Error as e:
+            logger.warning("Failed to clear shared answer cache: %s", e)
+
+    def set_corpus_version(self, version: Optional[str]) -> None:
+        try:
+            with self._lock:
+                stored = self._meta("corpus_version")
+            if version != stored:
+                self.clear(f"Corpus version changed to {version}.")
+                with self._lock:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO answer_cache_meta (key, value) VALUES ('corpus_version', ?)",
+                        (version,),
+                    )
+        except sqlite3.Error as e:
+            logger.warning("Failed to read shared corpus version: %s", e)
+        self.corpus_version = version
+
+    def stats(self) -> dict:
+        return {**super().stats(), "shared": True}
+
+
+_cache_options = dict(
+    enabled=settings.ANSWER_CACHE_ENABLED,
+    similarity_threshold=settings.ANSWER_CACHE_SIMILARITY,
+    ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+    max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+)
+answer_cache = (
+    SharedAnswerCache(settings.SHARED_CACHE_PATH, **_cache_options)
+    if settings.SHARED_CACHE_ENABLED
+    else AnswerCache(**_cache_options)
+)
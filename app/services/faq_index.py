@@ -0,0 +1,144 @@
+import re
+import threading
+import unicodedata
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from langchain.docstore.document import Document
+from langchain_core.embeddings import Embeddings
+from app.config.settings import settings
+from app.services.vector_index import InMemoryVectorIndex
+from app.utils.logging.logger import get_logger
+
+
+logger = get_logger("AI Agent")
+
+_PUNCTUATION = re.compile(r"[^\w\s]", re.UNICODE)
+
+
+def questions_collection(lang: str) -> str:
+    """Collection holding one row per FAQ question variant of `faq_{lang}.txt`."""
+    return f"faq_{lang}_questions"
+
+
+def normalize_question(question: str) -> str:
+    """Case-, accent- and punctuation-insensitive form used for exact matches."""
+    text = unicodedata.normalize("NFKD", question.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(_PUNCTUATION.sub(" ", text).split())
+
+
+@dataclass
+class FaqHit:
+    question: str  # the FAQ question that matched
+    answer: str
+    similarity: float
+
+
+class FaqIndex:
+    """
+    Question → canonical answer lookup over the FAQ files, held in memory.
+
+    Each question variant is indexed separately (see `seed_documents.parse_faq_entries`).
+    A question is answered directly when it equals a variant after normalization, or
+    when its embedding is at least `min_similarity` (cosine) from one. Entries are
+    numbered in file order, which is the same in every language, so a match in the
+    English FAQ is answered with the entry of the requested language.
+    """
+
+    def __init__(self, enabled: bool, min_similarity: float):
+        self.enabled = enabled
+        self.min_similarity = min_similarity
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._indexes: Dict[str, InMemoryVectorIndex] = {}
+        # lang -> (index version, normalized question -> entry, entry -> answer)
+        self._tables: Dict[str, Tuple[Optional[str], Dict[str, int], Dict[int, str]]] = {}
+
+    def load(self, engine, embeddings: Embeddings, languages: List[str]) -> None:
+        """Load the question collections of `languages` from Postgres."""
+        if not self.enabled:
+            return
+        for lang in languages:
+            try:
+                self.set_index(lang, InMemoryVectorIndex(
+                    engine, questions_collection(lang), embeddings,
+                    refresh_seconds=settings.VECTOR_INDEX_REFRESH_SECONDS,
+                ))
+            except Exception as e:
+                logger.error("Failed to load FAQ questions for '%s': %s", lang, str(e).split("\n")[0])
+
+    def set_index(self, lang: str, index: InMemoryVectorIndex) -> None:
+        with self._lock:
+            self._indexes[lang] = index
+            self._tables.pop(lang, None)
+
+    def _table(self, lang: str) -> Optional[Tuple[Dict[str, int], Dict[int, str]]]:
+        index = self._indexes.get(lang)
+        if index is None:
+            return None
+        with self._lock:
+            version, exact, answers = self._tables.get(lang, (None, None, None))
+            if exact is None or version != index.version:
+                exact, answers = {}, {}
+                for doc in index.documents():
+                    exact.setdefault(normalize_question(doc.page_content), doc.metadata["entry"])
+                    answers[doc.metadata["entry"]] = doc.metadata["answer"]
+                self._tables[lang] = (index.version, exact, answers)
+            return exact, answers
+
+    def _answer(self, lang: str, entry: int) -> Optional[str]:
+        table = self._table(lang)
+        return table[1].get(entry) if table else None
+
+    def _record(self, hit: Optional[FaqHit]) -> Optional[FaqHit]:
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return hit
+
+    def _languages(self, lang: str) -> List[str]:
+        return [lang] if lang == "en" else [lang, "en"]
+
+    def match_text(self, lang: str, question: str) -> Optional[FaqHit]:
+        """Exact (normalized) match against the question variants; needs no embedding."""
+        if not self.enabled:
+            return None
+        key = normalize_question(question)
+        for matched_lang in self._languages(lang):
+            table = self._table(matched_lang)
+            if table and key in table[0]:
+                answer = self._answer(lang, table[0][key])
+                if answer:
+                    return self._record(FaqHit(question, answer, 1.0))
+        return None
+
+    async def amatch_vector(self, lang: str, query_vector: List[float]) -> Optional[FaqHit]:
+        """Closest question variant if it is at least `min_similarity` similar to the query."""
+        if not self.enabled or query_vector is None:
+            return None
+        best: Optional[Tuple[float, Document]] = None
+        for matched_lang in self._languages(lang):
+            index = self._indexes.get(matched_lang)
+            if index is None:
+                continue
+            for doc, distance in await index.asimilarity_search_with_score_by_vector(query_vector, k=1):
+                if best is None or distance < best[0]:
+                    best = (distance, doc)
+        if best is None or 1.0 - best[0] < self.min_similarity:
+            return self._record(None)
+        distance, doc = best
+        answer = self._answer(lang, doc.metadata["entry"])
+        return self._record(FaqHit(doc.page_content, answer, 1.0 - distance) if answer else None)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "questions": sum(len(index) for index in self._indexes.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+faq_index = FaqIndex(enabled=settings.FAQ_DIRECT_ANSWER_ENABLED, min_similarity=settings.FAQ_DIRECT_ANSWER_SIMILARITY)
@@ -1,31 +1,371 @@
 # app/services/log_service.py
+import asyncio
+import json
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
 from datetime import datetime, timezone
+from typing import Callable, Deque, List, Optional, Tuple
+from sqlalchemy import insert, select
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
-from app.utils.db import SessionLocal
+from app.config.settings import settings
+from app.utils.db import engine, SessionLocal, AsyncSessionLocal
 from app.models.logs import AgentLog
 from app.schemas import LogEntry
 from app.utils.logging.logger import get_logger
+from app.utils.shared_cache import PRUNE_EVERY_WRITES, connect_shared, immediate, io_thread
 
 logger = get_logger("AI Agent")
 
 
-def save_log(session_id: str, question: str, answer: str, client_ip: str) -> None:
-    """Persist interaction log into Postgres."""
-    try:
-        with SessionLocal() as session:
-            log = AgentLog(
-                session_id=session_id,
-                question=question,
-                answer=answer,
-                ip_address= client_ip,
-                created_at=datetime.now(timezone.utc),
+@dataclass
+class HistoryTurn:
+    question: str
+    answer: str
+
+
+class _HistoryEntry:
+    def __init__(self, max_turns: int):
+        self.turns: Deque[HistoryTurn] = deque(maxlen=max_turns)
+        self.complete = False  # True once merged with the DB history
+        self.loaded_at = 0.0
+
+
+def _merge_history(cached: List[HistoryTurn], db_turns: List[HistoryTurn]) -> List[HistoryTurn]:
+    """
+    DB history followed by the cached turns it doesn't hold yet (the background writer
+    may not have flushed them). The cache is aligned on the newest DB rows, matching as
+    many of them as possible with the fewest cached turns before the match (so a repeated
+    turn that is still pending is kept); the cached turns after it are pending. If no
+    cached turn lines up, those missing from the DB history are pending.
+    """
+    keys = [(t.question, t.answer) for t in cached]
+    db_keys = [(t.question, t.answer) for t in db_turns]
+    best = None  # (matched rows, -cached turns before them, end of the match)
+    for end in range(1, len(keys) + 1) if db_keys else ():
+        matched = min(len(db_keys), end)
+        if keys[end - matched:end] == db_keys[len(db_keys) - matched:]:
+            best = max(best or (0, 0, 0), (matched, matched - end, end))
+    if best:
+        pending = cached[best[2]:]
+    else:
+        db_set = set(db_keys)
+        pending = [t for t, key in zip(cached, keys) if key not in db_set]
+    return db_turns + pending
+
+
+class SessionHistoryCache:
+    """
+    Bounded per-session ring buffer of the last N turns.
+
+    The /ask write path appends every turn, so active sessions never hit the DB.
+    Turns the DB doesn't hold yet (the background writer may not have flushed them)
+    are kept when the DB history is read, on the first read and whenever an entry
+    older than `ttl_seconds` is re-read; the least recently used
+    sessions are evicted beyond `max_sessions`.
+    """
+
+    def __init__(self, max_turns: int, max_sessions: int, ttl_seconds: int):
+        self.max_turns = max_turns
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._sessions: "OrderedDict[str, _HistoryEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _entry(self, session_id: str) -> _HistoryEntry:
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            entry = self._sessions[session_id] = _HistoryEntry(self.max_turns)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        self._sessions.move_to_end(session_id)
+        return entry
+
+    def get(self, session_id: str) -> Optional[List[HistoryTurn]]:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry and entry.complete and time.monotonic() - entry.loaded_at < self.ttl_seconds:
+                self._sessions.move_to_end(session_id)
+                self.hits += 1
+                return list(entry.turns)
+            self.misses += 1
+            return None
+
+    def append(self, session_id: str, turn: HistoryTurn) -> None:
+        with self._lock:
+            self._entry(session_id).turns.append(turn)
+
+    def load(self, session_id: str, db_turns: List[HistoryTurn]) -> List[HistoryTurn]:
+        """Merge DB history (oldest → newest) with pending turns and mark the entry complete."""
+        with self._lock:
+            entry = self._entry(session_id)
+            merged = _merge_history(list(entry.turns), db_turns)
+            entry.turns.clear()
+            entry.turns.extend(merged)
+            entry.complete = True
+            entry.loaded_at = time.monotonic()
+            return list(entry.turns)
+
+    async def aget(self, session_id: str) -> Optional[List[HistoryTurn]]:
+        """`get` for the event loop (the shared cache reads its file in its I/O thread)."""
+        return self.get(session_id)
+
+    async def aload(self, session_id: str, db_turns: List[HistoryTurn]) -> List[HistoryTurn]:
+        """`load` for the event loop."""
+        return self.load(session_id, db_turns)
+
+    def stats(self) -> dict:
+        return {"sessions": len(self._sessions), "hits": self.hits, "misses": self.misses}
+
+
+class SharedSessionHistoryCache(SessionHistoryCache):
+    """
+    SessionHistoryCache kept in a SQLite file shared by all worker processes, so
+    the worker serving a session's next request sees every turn, whichever worker
+    answered it.
+
+    All file I/O runs in the cache's I/O thread: `append` only queues the write, and
+    `aget` / `aload` run behind the writes queued before them, so a worker always reads
+    its own turns. Least recently used sessions are pruned every `PRUNE_EVERY_WRITES` writes.
+    """
+
+    def __init__(self, path: str, max_turns: int, max_sessions: int, ttl_seconds: int):
+        super().__init__(max_turns, max_sessions, ttl_seconds)
+        self._conn = connect_shared(path)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS session_history (
+                session_id TEXT PRIMARY KEY,
+                turns TEXT NOT NULL,
+                complete INTEGER NOT NULL,
+                loaded_at REAL NOT NULL,
+                last_access REAL NOT NULL
             )
-            session.add(log)
-            session.commit()
-    except SQLAlchemyError as e:
-        logger.error("Failed to save log: %s", str(e).split("\n")[0])
-        raise
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_session_history_last_access ON session_history (last_access)")
+        self._io = io_thread("shared-session-history")
+        self._writes = 0
+
+    def _read(self, session_id: str) -> Optional[Tuple[List[HistoryTurn], bool, float]]:
+        row = self._conn.execute(
+            "SELECT turns, complete, loaded_at FROM session_history WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return [HistoryTurn(q, a) for q, a in json.loads(row[0])], bool(row[1]), row[2]
+
+    def _write(self, session_id: str, turns: List[HistoryTurn], complete: bool, loaded_at: float) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO session_history (session_id, turns, complete, loaded_at, last_access)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (session_id, json.dumps([(t.question, t.answer) for t in turns[-self.max_turns:]]),
+             int(complete), loaded_at, time.time()),
+        )
+        self._writes += 1
+        if self._writes % PRUNE_EVERY_WRITES == 0:
+            self._conn.execute(
+                "DELETE FROM session_history WHERE session_id IN ("
+                " SELECT session_id FROM session_history ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_sessions,),
+            )
+
+    def get(self, session_id: str) -> Optional[List[HistoryTurn]]:
+        try:
+            with self._lock:
+                row = self._read(session_id)
+        except sqlite3.Error as e:
+            logger.warning("Shared session history unavailable: %s", e)
+            row = None
+        if row and row[1] and time.time() - row[2] < self.ttl_seconds:
+            self.hits += 1
+            return row[0]
+        self.misses += 1
+        return None
+
+    def append(self, session_id: str, turn: HistoryTurn) -> None:
+        self._io.submit(self._append, session_id, turn)
+
+    def _append(self, session_id: str, turn: HistoryTurn) -> None:
+        try:
+            with self._lock, immediate(self._conn):
+                turns, complete, loaded_at = self._read(session_id) or ([], False, 0.0)
+                self._write(session_id, turns + [turn], complete, loaded_at)
+        except sqlite3.Error as e:
+            logger.warning("Failed to record turn in shared session history: %s", e)
+
+    def load(self, session_id: str, db_turns: List[HistoryTurn]) -> List[HistoryTurn]:
+        try:
+            with self._lock, immediate(self._conn):
+                turns, _, _ = self._read(session_id) or ([], False, 0.0)
+                merged = _merge_history(turns, db_turns)[-self.max_turns:]
+                self._write(session_id, merged, True, time.time())
+            return merged
+        except sqlite3.Error as e:
+            logger.warning("Failed to store shared session history: %s", e)
+            return db_turns[-self.max_turns:]
+
+    async def aget(self, session_id: str) -> Optional[List[HistoryTurn]]:
+        return await asyncio.get_running_loop().run_in_executor(self._io, self.get, session_id)
+
+    async def aload(self, session_id: str, db_turns: List[HistoryTurn]) -> List[HistoryTurn]:
+        return await asyncio.get_running_loop().run_in_executor(self._io, self.load, session_id, db_turns)
+
+    def stats(self) -> dict:
+        try:
+            with self._lock:
+                sessions = self._conn.execute("SELECT COUNT(*) FROM session_history").fetchone()[0]
+        except sqlite3.Error:
+            sessions = None
+        return {"sessions": sessions, "hits": self.hits, "misses": self.misses, "shared": True}
+
+
+_history_options = dict(
+    max_turns=settings.SESSION_HISTORY_TURNS,
+    max_sessions=settings.SESSION_CACHE_MAX_SESSIONS,
+    ttl_seconds=settings.SESSION_CACHE_TTL_SECONDS,
+)
+session_history = (
+    SharedSessionHistoryCache(settings.SHARED_CACHE_PATH, **_history_options)
+    if settings.SHARED_CACHE_ENABLED
+    else SessionHistoryCache(**_history_options)
+)
+
+
+def insert_logs(batch: List[dict]) -> None:
+    """Default `LogWriter` sink: one multi-row INSERT into agent_logs."""
+    with engine.begin() as conn:
+        conn.execute(insert(AgentLog.__table__), batch)
+
+
+class LogWriter:
+    """
+    Background sink for interaction logs.
+
+    Requests enqueue rows into a bounded in-memory queue and return immediately.
+    A daemon thread flushes them with a multi-row INSERT once `batch_size` rows are
+    waiting or `flush_interval` seconds have passed. Rows are dropped (and counted)
+    when the queue is full; a failed batch is retried row by row. `sink` replaces the
+    database insert (e.g. in benchmarks).
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        batch_size: int,
+        flush_interval: float,
+        sink: Optional[Callable[[List[dict]], None]] = None,
+    ):
+        self.sink = sink or insert_logs
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueued = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.failed = 0
+        self._queue: "queue.Queue[dict]" = queue.Queue(maxsize=max_size)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Drain the queue and stop the worker (blocks; use `asyncio.to_thread` from async code)."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+        logger.info("Log writer stopped: %s", self.stats())
+
+    def enqueue(self, row: dict) -> bool:
+        if not (self._thread and self._thread.is_alive()):
+            self.start()
+        try:
+            self._queue.put_nowait(row)
+            self.enqueued += 1
+            return True
+        except queue.Full:
+            self.dropped += 1
+            logger.warning("Log queue full, dropping log for session %s.", row.get("session_id"))
+            return False
+
+    def _next_batch(self) -> List[dict]:
+        batch: List[dict] = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, batch: List[dict]) -> None:
+        """Insert `batch`; if that fails, retry its rows one by one so one bad row loses only itself."""
+        try:
+            self.sink(batch)
+            self.flushed += len(batch)
+            return
+        except Exception as e:
+            if len(batch) == 1:
+                self.failed += 1
+                logger.error("Failed to save log for session %s: %s", batch[0].get("session_id"), str(e).split("\n")[0])
+                return
+            logger.warning("Failed to save %s logs, retrying one by one: %s", len(batch), str(e).split("\n")[0])
+        for row in batch:
+            self._flush([row])
+
+    def _run(self) -> None:
+        while not (self._stop.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            if batch:
+                self._flush(batch)
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "enqueued": self.enqueued,
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+
+# X-Forwarded-For may list several hops; longer values would fail the insert
+IP_ADDRESS_MAX_LENGTH = AgentLog.__table__.c.ip_address.type.length
+
+log_writer = LogWriter(
+    max_size=settings.LOG_QUEUE_MAX_SIZE,
+    batch_size=settings.LOG_BATCH_SIZE,
+    flush_interval=settings.LOG_FLUSH_INTERVAL_SECONDS,
+)
+
+
+def save_log(session_id: str, question: str, answer: str, client_ip: str) -> None:
+    """
+    Queue an interaction log for the background writer (never blocks the request)
+    and record the turn in the session history cache.
+    """
+    session_history.append(session_id, HistoryTurn(question, answer))
+    log_writer.enqueue({
+        "session_id": session_id,
+        "question": question,
+        "answer": answer,
+        "ip_address": client_ip[:IP_ADDRESS_MAX_LENGTH] if client_ip else client_ip,
+        "created_at": datetime.now(timezone.utc),
+    })
 
 
 def get_logs(limit: int = 50):
@@ -60,11 +400,19 @@ def get_logs(limit: int = 50):
         raise
 
 
-def get_last_messages(session_id: str, limit: int = 5):
+def _history_turns(logs) -> List[HistoryTurn]:
+    # DB rows come newest first; cache and callers want oldest → newest
+    return [HistoryTurn(log.question, log.answer) for log in reversed(logs)]
+
+
+def get_last_messages(session_id: str, limit: int = settings.SESSION_HISTORY_TURNS) -> List[HistoryTurn]:
     """
     Return the last N question/answer pairs for a given session_id.
-    Ordered from oldest to newest.
+    Ordered from oldest to newest. Served from the in-memory ring buffer when possible.
     """
+    cached = session_history.get(session_id)
+    if cached is not None:
+        return cached[-limit:]
     try:
         with SessionLocal() as session:
             logs = (
@@ -74,8 +422,27 @@ def get_last_messages(session_id: str, limit: int = 5):
                 .limit(limit)
                 .all()
             )
-        # reverse so they're in order: oldest → newest
-        return list(reversed(logs))
+        return session_history.load(session_id, _history_turns(logs))[-limit:]
+    except SQLAlchemyError as e:
+        logger.error("Failed to get session history: %s", str(e).split("\n")[0])
+        return []
+
+
+async def aget_last_messages(session_id: str, limit: int = settings.SESSION_HISTORY_TURNS) -> List[HistoryTurn]:
+    """Async variant of `get_last_messages`. Ordered from oldest to newest."""
+    cached = await session_history.aget(session_id)
+    if cached is not None:
+        return cached[-limit:]
+    try:
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(AgentLog)
+                .where(AgentLog.session_id == session_id)
+                .order_by(AgentLog.created_at.desc())
+                .limit(limit)
+            )
+            logs = result.scalars().all()
+        return (await session_history.aload(session_id, _history_turns(logs)))[-limit:]
     except SQLAlchemyError as e:
         logger.error("Failed to get session history: %s", str(e).split("\n")[0])
         return []
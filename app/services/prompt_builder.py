@@ -0,0 +1,141 @@
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
+import tiktoken
+from langchain.docstore.document import Document
+from app.config.settings import settings
+from app.utils.logging.logger import get_logger
+
+
+logger = get_logger("AI Agent")
+
+# Chat-format overhead per message (role and separators), as in OpenAI's token-counting guide
+MESSAGE_OVERHEAD_TOKENS = 4
+# Don't keep a truncated history turn shorter than this
+MIN_TRUNCATED_TURN_TOKENS = 32
+
+_encoding_loaded = threading.Event()
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    """tiktoken encoding for `OPENAI_MODEL`, or None if tiktoken can't load one (e.g. offline)."""
+    try:
+        try:
+            return tiktoken.encoding_for_model(settings.OPENAI_MODEL or "")
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning("tiktoken unavailable, estimating tokens from length: %s", str(e).split("\n")[0])
+        return None
+
+
+def load_encoding() -> None:
+    """
+    Load the tiktoken encoding, which may download its BPE file (without a timeout).
+    Called by the startup loader, off the event loop; until it is done, token counts
+    are estimated from length rather than loading it on the request path.
+    """
+    _encoding()
+    _encoding_loaded.set()
+
+
+def _loaded_encoding():
+    return _encoding() if _encoding_loaded.is_set() else None
+
+
+def count_tokens(text: str) -> int:
+    encoding = _loaded_encoding()
+    if encoding is None:
+        return max(1, len(text) // 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    encoding = _loaded_encoding()
+    if encoding is None:
+        return text[: max_tokens * 4]
+    return encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+
+
+@lru_cache(maxsize=8)
+def system_prefix(lang: str) -> Tuple[str, int]:
+    """Static part of the system prompt for `lang` and its token count (built once per language)."""
+    text = (
+        f"You are a helpful assistant. You must always answer strictly in {lang.upper()}.\n\n"
+        "You are a helpful assistant that answers questions using ONLY the following context blocks.\n\n"
+        "Each block starts with [source: cv] or [source: faq]. Use the information in these blocks to answer the user question.\n\n"
+        "Do NOT use any prior knowledge, facts, or general information. Your answer MUST be based strictly on the provided context blocks.\n\n"
+        "If the answer is not found explicitly in the context, respond exactly with:\n"
+        "\"I couldn’t find that information in Jorge’s profile. Please ask about his background, education, experience, or skills.\"\n\n"
+        "Give priority to blocks marked as [source: faq] if the question is about preferences, opinions, or personal logistics (e.g., salary, availability, goals, etc.).\n\n"
+        f"You must always answer in {lang.upper()}.\n\n"
+    )
+    return text, count_tokens(text)
+
+
+def chunk_tokens(doc: Document) -> int:
+    """Token count stored at seed time, computed on the fly for older chunks."""
+    stored = doc.metadata.get("token_count")
+    return stored if isinstance(stored, int) else count_tokens(doc.page_content)
+
+
+@dataclass
+class BuiltPrompt:
+    messages: List[dict]
+    prompt_tokens: int
+    chunks_used: int
+    turns_used: int
+
+
+def build_prompt(
+    lang: str,
+    question: str,
+    docs: Sequence[Document],
+    history: Sequence,
+    source: Optional[str] = None,
+    budget: Optional[int] = None,
+) -> BuiltPrompt:
+    """
+    Assemble the chat messages within `budget` prompt tokens (`PROMPT_TOKEN_BUDGET`).
+
+    The system prefix and the question are always included. Context chunks are added
+    by relevance (the best one is always kept), then history turns from newest to
+    oldest; the oldest turn that doesn't fit is truncated, older ones are dropped.
+    """
+    budget = budget or settings.PROMPT_TOKEN_BUDGET
+    prefix, used = system_prefix(lang)
+    used += 2 * MESSAGE_OVERHEAD_TOKENS + count_tokens(question)
+
+    blocks: List[str] = []
+    for doc in docs:
+        header = f"[source: {doc.metadata.get('collection', source)}]\n"
+        cost = count_tokens(header) + chunk_tokens(doc) + 3  # block separator
+        if blocks and used + cost > budget:
+            continue  # a shorter, less relevant chunk may still fit
+        blocks.append(header + doc.page_content)
+        used += cost
+
+    turns: List[dict] = []
+    for turn in reversed(list(history)):
+        question_tokens = count_tokens(turn.question)
+        answer_tokens = count_tokens(turn.answer)
+        cost = question_tokens + answer_tokens + 2 * MESSAGE_OVERHEAD_TOKENS
+        truncated = used + cost > budget
+        answer = turn.answer
+        if truncated:
+            room = budget - used - question_tokens - 2 * MESSAGE_OVERHEAD_TOKENS
+            if room < MIN_TRUNCATED_TURN_TOKENS:
+                break
+            answer = _truncate(turn.answer, room)
+            cost = question_tokens + room + 2 * MESSAGE_OVERHEAD_TOKENS
+        turns[:0] = [{"role": "user", "content": turn.question}, {"role": "assistant", "content": answer}]
+        used += cost
+        if truncated:
+            break
+
+    messages = [{"role": "system", "content": prefix + "\n\n---\n\n".join(blocks)}]
+    messages.extend(turns)
+    messages.append({"role": "user", "content": question})
+    return BuiltPrompt(messages, used, len(blocks), len(turns) // 2)
@@ -0,0 +1,41 @@
+import threading
+from typing import Dict
+
+
+class Readiness:
+    """
+    Startup progress of the vector stores, filled in by the background loader.
+
+    phase: starting → seeding → loading → ready (or failed)
+    collections: name → pending | ready | failed
+    """
+
+    def __init__(self) -> None:
+        self.phase = "starting"
+        self.collections: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def set_phase(self, phase: str) -> None:
+        with self._lock:
+            self.phase = phase
+
+    def set_collection(self, name: str, state: str) -> None:
+        with self._lock:
+            self.collections[name] = state
+
+    @property
+    def ready(self) -> bool:
+        return self.phase == "ready"
+
+    @property
+    def serving(self) -> bool:
+        """True once /ask can run: one collection is loaded, or startup is over either way."""
+        with self._lock:
+            return self.phase in ("ready", "failed") or "ready" in self.collections.values()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"phase": self.phase, "collections": dict(self.collections)}
+
+
+readiness = Readiness()
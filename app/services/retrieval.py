@@ -0,0 +1,258 @@
+import asyncio
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from langchain.docstore.document import Document
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from app.config.settings import settings
+from app.services.vectorstore import embeddings, VectorStore, TEXT_SEARCH_CONFIGS
+from app.services.vector_index import InMemoryVectorIndex
+from app.utils.db import async_engine
+from app.utils.logging.logger import get_logger
+
+
+logger = get_logger("AI Agent")
+
+FALLBACK_COLLECTIONS = ["cv_en_embeddings", "faq_en_embeddings"]
+
+# Bounds in-flight collection searches across all requests so a burst can't exhaust the DB pool
+_search_slots = asyncio.Semaphore(settings.RETRIEVAL_MAX_CONCURRENCY)
+
+
+def language_collections(lang: str) -> List[str]:
+    return [f"cv_{lang}_embeddings", f"faq_{lang}_embeddings"]
+
+
+async def aembed_query(question: str) -> List[float]:
+    """
+    Embed the question once so every collection lookup can reuse the same vector.
+    """
+    return await embeddings.aembed_query(question)
+
+
+def _with_collection(doc: Document, collection_name: str) -> Document:
+    return Document(page_content=doc.page_content, metadata={**doc.metadata, "collection": collection_name})
+
+
+async def _asearch_index(vector_store: InMemoryVectorIndex, query_vector: List[float], k: int) -> List[Tuple[Document, float]]:
+    async with _search_slots:
+        return await vector_store.asimilarity_search_with_score_by_vector(query_vector, k=k)
+
+
+async def _asearch_pgvector(collections: List[str], query_vector: List[float], k: int) -> List[Tuple[Document, float]]:
+    """
+    One pgvector query over every requested collection, ordered by cosine distance.
+
+    The collection filter applies after the ANN scan, so an approximate search can come
+    back short; it is then repeated as an exact scan. The chunk-row predicate matches
+    `vectorstore.CHUNK_ROWS`, so the partial ANN index applies.
+    """
+    query = text("""
+        SELECT c.name, e.document, e.cmetadata, e.embedding <=> CAST(:embedding AS vector) AS distance
+        FROM langchain_pg_embedding e
+        JOIN langchain_pg_collection c ON c.uuid = e.collection_id
+        WHERE e.collection_id = ANY(ARRAY(SELECT uuid FROM langchain_pg_collection WHERE name = ANY(:names)))
+          AND (e.cmetadata->>'answer') IS NULL
+        ORDER BY distance
+        LIMIT :k
+    """)
+    params = {"embedding": "[" + ",".join(map(str, query_vector)) + "]", "names": collections, "k": k}
+    async with _search_slots:
+        async with async_engine.begin() as conn:
+            rows = (await conn.execute(query, params)).all()
+            if len(rows) < k:
+                await conn.execute(text("SET LOCAL enable_indexscan = off"))
+                rows = (await conn.execute(query, params)).all()
+    return [
+        (Document(page_content=document, metadata={**(cmetadata or {}), "collection": name}), distance)
+        for name, document, cmetadata, distance in rows
+    ]
+
+
+async def asearch_collections(
+    vector_stores: Dict[str, VectorStore],
+    collections: List[str],
+    query_vector: List[float],
+    k: int = 4,
+    max_distance: Optional[float] = None,
+) -> List[Tuple[Document, float]]:
+    """
+    Global top-k over the loaded `collections`, best first. Each document's
+    `metadata["collection"]` names the collection it came from. Chunks farther than
+    `max_distance` (cosine distance) are dropped.
+    """
+    names = [name for name in collections if vector_stores.get(name)]
+    if not names:
+        return []
+    if all(isinstance(vector_stores[name], InMemoryVectorIndex) for name in names):
+        results = await asyncio.gather(*(_asearch_index(vector_stores[name], query_vector, k) for name in names))
+        merged = [
+            (_with_collection(doc, name), distance)
+            for name, docs_and_scores in zip(names, results)
+            for doc, distance in docs_and_scores
+        ]
+        top = sorted(merged, key=lambda item: item[1])[:k]
+    else:
+        top = await _asearch_pgvector(names, query_vector, k)
+    if max_distance is not None:
+        top = [(doc, distance) for doc, distance in top if distance <= max_distance]
+    return top
+
+
+@dataclass
+class LexicalHit:
+    document: Document
+    rank: float
+    exact: bool  # every query term occurs in the chunk
+
+
+@dataclass
+class LexicalResult:
+    terms: int = 0  # distinct lexemes in the question
+    max_term_share: float = 1.0  # share of the searched chunks containing the question's most common term
+    hits: Dict[str, List[LexicalHit]] = field(default_factory=dict)  # per collection, best first
+
+    def ranked(self) -> List[LexicalHit]:
+        """Hits of every collection, best first."""
+        return sorted((hit for hits in self.hits.values() for hit in hits), key=lambda hit: hit.rank, reverse=True)
+
+    def fast_path(self, k: int) -> Optional[Tuple[List[Document], str]]:
+        """
+        Global top-k context for a short keyword question whose terms all occur in
+        its best chunk and are all rare in the corpus (each in at most
+        `LEXICAL_FAST_PATH_MAX_TERM_SHARE` of the chunks), with that chunk's collection
+        as source. None otherwise: a common term ("experience") makes the keyword
+        ranking too weak to pick the context without the embedding.
+        """
+        if not self.terms or self.terms > settings.LEXICAL_FAST_PATH_MAX_TERMS:
+            return None
+        if self.max_term_share > settings.LEXICAL_FAST_PATH_MAX_TERM_SHARE:
+            return None
+        ranked = self.ranked()
+        if not ranked or not ranked[0].exact:
+            return None
+        return [hit.document for hit in ranked[:k]], ranked[0].document.metadata["collection"]
+
+
+async def asearch_lexical(collections: List[str], question: str, lang: str, k: int = 4) -> LexicalResult:
+    """
+    Full-text search of the collections with the language's dictionary (any-term match,
+    ranked by `ts_rank_cd`), plus how common the question's most common term is.
+    Uses the GIN indexes from `ensure_text_search_indexes`. Returns an empty result if
+    the query fails.
+    """
+    config = TEXT_SEARCH_CONFIGS.get(lang, "english")
+    document_vector = f"to_tsvector('{config}', e.document)"
+    query = text(f"""
+        WITH q AS (
+            SELECT plainto_tsquery('{config}', :question) AS all_terms,
+                   replace(plainto_tsquery('{config}', :question)::text, '&', '|')::tsquery AS any_term,
+                   coalesce(array_length(tsvector_to_array(to_tsvector('{config}', :question)), 1), 0) AS terms
+        ),
+        searched AS (
+            SELECT uuid FROM langchain_pg_collection WHERE name = ANY(:names)
+        ),
+        rarity AS (
+            SELECT coalesce(max(matches), 0)::float / greatest(
+                       (SELECT count(*) FROM langchain_pg_embedding e WHERE e.collection_id IN (SELECT uuid FROM searched)), 1
+                   ) AS max_term_share
+            FROM (
+                SELECT (
+                    SELECT count(*) FROM langchain_pg_embedding e
+                    WHERE e.collection_id IN (SELECT uuid FROM searched)
+                      AND {document_vector} @@ quote_literal(lexeme)::tsquery
+                ) AS matches
+                FROM unnest(tsvector_to_array(to_tsvector('{config}', :question))) AS lexeme
+            ) per_term
+        )
+        SELECT name, document, cmetadata, rank, exact, terms, max_term_share FROM (
+            SELECT c.name, e.document, e.cmetadata, q.terms,
+                   ts_rank_cd({document_vector}, q.any_term) AS rank,
+                   {document_vector} @@ q.all_terms AS exact,
+                   row_number() OVER (
+                       PARTITION BY c.name ORDER BY ts_rank_cd({document_vector}, q.any_term) DESC
+                   ) AS position
+            FROM langchain_pg_embedding e
+            JOIN langchain_pg_collection c ON e.collection_id = c.uuid
+            CROSS JOIN q
+            WHERE c.name = ANY(:names) AND {document_vector} @@ q.any_term
+        ) ranked
+        CROSS JOIN rarity
+        WHERE position <= :k
+        ORDER BY name, position
+    """)
+    result = LexicalResult()
+    try:
+        async with _search_slots:
+            async with async_engine.connect() as conn:
+                rows = (await conn.execute(query, {"question": question, "names": collections, "k": k})).all()
+    except SQLAlchemyError as e:
+        logger.error("Lexical search failed: %s", str(e).split("\n")[0])
+        return result
+    for name, document, cmetadata, rank, exact, terms, max_term_share in rows:
+        result.terms = terms
+        result.max_term_share = max_term_share
+        result.hits.setdefault(name, []).append(
+            LexicalHit(Document(page_content=document, metadata={**(cmetadata or {}), "collection": name}), rank, exact)
+        )
+    return result
+
+
+def fuse_rankings(vector_docs: List[Document], lexical_hits: List[LexicalHit], k: int) -> List[Document]:
+    """Reciprocal rank fusion of the vector and lexical candidates."""
+    if not lexical_hits:
+        return vector_docs
+    scores: Dict[str, float] = {}
+    documents: Dict[str, Document] = {}
+    for ranking in (vector_docs, [hit.document for hit in lexical_hits]):
+        for position, doc in enumerate(ranking):
+            documents.setdefault(doc.page_content, doc)
+            scores[doc.page_content] = scores.get(doc.page_content, 0.0) + 1.0 / (settings.HYBRID_RRF_K + position + 1)
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    return [documents[key] for key in ranked[:k]]
+
+
+async def aretrieve(
+    vector_stores: Dict[str, VectorStore],
+    lang: str,
+    query_vector: List[float],
+    k: int = 4,
+    lexical: Optional[LexicalResult] = None,
+) -> Tuple[List[Document], Optional[str], bool]:
+    """
+    Retrieve the global top-k chunks for `lang` (cv and faq together), falling back
+    to English collections.
+
+    With `SPECULATIVE_FALLBACK` the English search is issued together with the
+    language-specific one, so the fallback costs no extra round-trip.
+    Chunks beyond `RETRIEVAL_MAX_DISTANCE` are dropped, so an irrelevant question
+    yields no documents (and no LLM call). Lexical hits for the language's
+    collections (if given) are fused into the vector results.
+    Returns (documents, source of the best chunk, used_fallback).
+    """
+    collections = language_collections(lang)
+    fallback = FALLBACK_COLLECTIONS if lang != "en" else []
+    max_distance = settings.RETRIEVAL_MAX_DISTANCE
+
+    def result(docs_and_scores: List[Tuple[Document, float]], used_fallback: bool) -> Tuple[List[Document], Optional[str], bool]:
+        docs = [doc for doc, _ in docs_and_scores]
+        if not docs:
+            return [], None, False
+        source = docs[0].metadata["collection"]
+        if lexical and not used_fallback:
+            docs = fuse_rankings(docs, lexical.ranked(), k)
+        return docs, source, used_fallback
+
+    if not fallback or not settings.SPECULATIVE_FALLBACK:
+        primary = await asearch_collections(vector_stores, collections, query_vector, k, max_distance)
+        if primary or not fallback:
+            return result(primary, False)
+        return result(await asearch_collections(vector_stores, fallback, query_vector, k, max_distance), True)
+
+    primary, secondary = await asyncio.gather(
+        asearch_collections(vector_stores, collections, query_vector, k, max_distance),
+        asearch_collections(vector_stores, fallback, query_vector, k, max_distance),
+    )
+    if primary:
+        return result(primary, False)
+    return result(secondary, True)
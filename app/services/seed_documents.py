@@ -1,20 +1,37 @@
 import os
 import re
-from typing import List
+import json
+import time
+import random
+import hashlib
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+import openai
+from sqlalchemy import text
+from sqlalchemy.exc import ProgrammingError
 from langchain.docstore.document import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_postgres.vectorstores import PGVector
-from langchain_openai import OpenAIEmbeddings
 from app.config.settings import settings
+from app.utils.db import engine
+from app.utils.embeddings import get_embeddings
 from app.utils.logging.logger import get_logger
+from app.services.answer_cache import answer_cache
+from app.services.faq_index import questions_collection
+from app.services.prompt_builder import count_tokens
+from app.utils.timing import StageTimer
 
 
 logger = get_logger("SeedDocuments")
 
-embeddings = OpenAIEmbeddings(api_key=settings.OPENAI_API_KEY)
+embeddings = get_embeddings()
 
-CONNECTION_URI = f"postgresql+psycopg://{settings.POSTGRES_USER}:{settings.POSTGRES_PASSWORD.get_secret_value()}@{settings.POSTGRES_HOST}:{settings.POSTGRES_PORT}/{settings.POSTGRES_DB}"
+SEED_BACKOFF_MAX_SECONDS = 60
 
+# Arbitrary key (next to MIGRATIONS_LOCK_KEY) so concurrent processes seed one at a time
+SEED_LOCK_KEY = 7415028312
 
 def parse_sections_from_text(raw_text: str) -> List[Document]:
     """
@@ -55,9 +72,266 @@ def parse_sections_from_text(raw_text: str) -> List[Document]:
     return documents
 
 
-def seed_all_documents_in_data_folder():
+FAQ_QUESTION = re.compile(r"^\*\s*\*\*(?:Q|P)\s?:\*\*\s*(.+)$")
+FAQ_ANSWER = re.compile(r"^\*\s*\*\*(?:A|R)\s?:\*\*\s*(.+)$")
+
+
+def parse_faq_entries(raw_text: str) -> List[Document]:
+    """
+    One Document per question variant of a FAQ file (`* **Q:** a / b` then `* **A:** ...`),
+    with the canonical answer and the entry number (file order) in its metadata.
+    The content hash covers question and answer, so editing an answer reseeds the row.
+    """
+    documents = []
+    section = None
+    questions: List[str] = []
+    entry = 0
+    for line in raw_text.splitlines():
+        stripped = line.strip()
+        if stripped.startswith("#"):
+            section = stripped.lstrip("#").strip()
+        elif FAQ_QUESTION.match(stripped):
+            questions = [q.strip() for q in FAQ_QUESTION.match(stripped).group(1).split(" / ") if q.strip()]
+        elif FAQ_ANSWER.match(stripped) and questions:
+            answer = FAQ_ANSWER.match(stripped).group(1).strip()
+            for question in questions:
+                documents.append(Document(
+                    page_content=question,
+                    metadata={
+                        "entry": entry,
+                        "section": section,
+                        "answer": answer,
+                        "content_hash": hash_text(f"{question}\n{answer}"),
+                    },
+                ))
+            entry += 1
+            questions = []
+    return documents
+
+
+def hash_text(value: str) -> str:
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+def embeddings_namespace() -> str:
+    """Provider, model and dimensions of the stored vectors."""
+    base = getattr(embeddings, "underlying_embeddings", embeddings)
+    return f"{settings.EMBEDDING_PROVIDER.lower()}:{getattr(base, 'model', '')}:{settings.EMBEDDING_DIMENSIONS}"
+
+
+def namespaced_hash(value: str) -> str:
+    """Source and chunk hash; covers the embeddings namespace, so switching models re-embeds."""
+    return hash_text(f"{embeddings_namespace()}\n{value}")
+
+
+def get_source_hash(collection_name: str) -> Optional[str]:
+    """Return the hash of the file last synced into the collection, if any."""
+    try:
+        with engine.connect() as conn:
+            cmetadata = conn.execute(
+                text("SELECT cmetadata FROM langchain_pg_collection WHERE name = :name"),
+                {"name": collection_name},
+            ).scalar()
+    except ProgrammingError:
+        # Tables not created yet (first run)
+        return None
+    return (cmetadata or {}).get("source_hash")
+
+
+def set_source_hash(collection_name: str, source_hash: str) -> None:
+    with engine.begin() as conn:
+        cmetadata = conn.execute(
+            text("SELECT cmetadata FROM langchain_pg_collection WHERE name = :name"),
+            {"name": collection_name},
+        ).scalar() or {}
+        cmetadata["source_hash"] = source_hash
+        conn.execute(
+            text("UPDATE langchain_pg_collection SET cmetadata = CAST(:cmetadata AS json) WHERE name = :name"),
+            {"cmetadata": json.dumps(cmetadata), "name": collection_name},
+        )
+
+
+def get_existing_chunks(collection_name: str) -> List[Tuple[str, Optional[str]]]:
+    """Return (id, content_hash) for every stored chunk. Legacy rows have no hash."""
+    try:
+        with engine.connect() as conn:
+            rows = conn.execute(
+                text("""
+                    SELECT e.id, e.cmetadata->>'content_hash'
+                    FROM langchain_pg_embedding e
+                    JOIN langchain_pg_collection c ON e.collection_id = c.uuid
+                    WHERE c.name = :name
+                """),
+                {"name": collection_name},
+            ).all()
+    except ProgrammingError:
+        # Tables not created yet (first run)
+        return []
+    return [(row[0], row[1]) for row in rows]
+
+
+@dataclass
+class SeedPlan:
+    """Pending changes for one collection, built from its source file."""
+    filename: str
+    collection_name: str
+    source_hash: str
+    chunks: List[Document]
+    new_chunks: List[Document] = field(default_factory=list)
+    stale_ids: List[str] = field(default_factory=list)
+
+
+def plan_source(
+    folder: str,
+    filename: str,
+    collection_name: str,
+    split: Callable[[str], List[Document]],
+    force: bool = False,
+) -> Optional[SeedPlan]:
+    """
+    Read, hash, split and diff one source file. Returns None if it is empty or already
+    synced (same source hash and rows stored); `force` re-embeds every chunk.
+    """
+    with open(os.path.join(folder, filename), "r", encoding="utf-8") as f:
+        raw_text = f.read()
+    if not raw_text.strip():
+        logger.warning("Skipping empty file: %s", filename)
+        return None
+    source_hash = namespaced_hash(raw_text)
+    existing = get_existing_chunks(collection_name)
+    if not force and existing and get_source_hash(collection_name) == source_hash:
+        logger.info("Collection '%s' is up to date, skipping %s.", collection_name, filename)
+        return None
+    chunks = split(raw_text)
+    plan = SeedPlan(filename, collection_name, source_hash, chunks)
+    diff_collection(plan, existing, force)
+    return plan
+
+
+def diff_collection(plan: SeedPlan, existing: List[Tuple[str, Optional[str]]], force: bool = False) -> None:
+    """
+    Compare the plan's chunks with the `existing` (id, content_hash) rows.
+    Only chunks whose hash is not stored yet need embedding; stored chunks that
+    no longer exist (or are duplicates) are marked stale. With `force` every
+    stored chunk is stale and every chunk is embedded again.
+    """
+    current: Dict[str, Document] = {}
+    for chunk in plan.chunks:
+        content_hash = namespaced_hash(chunk.metadata.get("content_hash") or chunk.page_content)
+        chunk.metadata.update({
+            "source": plan.filename,
+            "content_hash": content_hash,
+            "token_count": count_tokens(chunk.page_content),
+        })
+        current.setdefault(content_hash, chunk)
+
+    kept = set()
+    for chunk_id, content_hash in existing:
+        if not force and content_hash in current and content_hash not in kept:
+            kept.add(content_hash)
+        else:
+            plan.stale_ids.append(chunk_id)
+    plan.new_chunks = [chunk for h, chunk in current.items() if h not in kept]
+
+
+def _retry_delay(error: Exception, attempt: int) -> Optional[float]:
+    """Seconds to wait before retrying an embedding batch, or None if the error is not transient."""
+    if isinstance(error, openai.APIStatusError):
+        if error.status_code not in (408, 409, 429) and error.status_code < 500:
+            return None
+    elif not isinstance(error, openai.APIConnectionError):  # includes timeouts
+        return None
+    retry_after = getattr(getattr(error, "response", None), "headers", {}).get("retry-after")
+    try:
+        return float(retry_after)
+    except (TypeError, ValueError):
+        return min(SEED_BACKOFF_MAX_SECONDS, 2 ** attempt) + random.uniform(0, 1)
+
+
+def embed_batch(texts: List[str]) -> List[List[float]]:
+    """Embed one provider-sized batch, backing off on rate limits and transient errors."""
+    for attempt in range(settings.SEED_EMBED_MAX_RETRIES + 1):
+        try:
+            return embeddings.embed_documents(texts)
+        except Exception as e:
+            delay = _retry_delay(e, attempt)
+            if delay is None or attempt == settings.SEED_EMBED_MAX_RETRIES:
+                raise
+            logger.warning("Embedding batch failed (%s), retrying in %.1fs...", str(e).split("\n")[0], delay)
+            time.sleep(delay)
+
+
+def copy_chunks(conn, collection_id: str, plan: SeedPlan, vectors: List[List[float]]) -> None:
+    """Bulk-insert the plan's new chunks with COPY on the given SQLAlchemy connection."""
+    with conn.connection.driver_connection.cursor() as cursor:
+        with cursor.copy(
+            "COPY langchain_pg_embedding (id, collection_id, embedding, document, cmetadata) FROM STDIN"
+        ) as copy:
+            for chunk, vector in zip(plan.new_chunks, vectors):
+                copy.write_row((
+                    f"{plan.collection_name}:{chunk.metadata['content_hash']}",
+                    collection_id,
+                    "[" + ",".join(map(str, vector)) + "]",
+                    chunk.page_content,
+                    json.dumps(chunk.metadata),
+                ))
+
+
+def write_collection(plan: SeedPlan, vectors: List[List[float]]) -> None:
+    """Delete stale chunks and COPY the new ones in a single transaction."""
+    # Creates the tables and the collection row on first use
+    PGVector(
+        embeddings,
+        collection_name=plan.collection_name,
+        connection=engine,
+        embedding_length=settings.EMBEDDING_DIMENSIONS,
+    )
+    with engine.begin() as conn:
+        collection_id = conn.execute(
+            text("SELECT uuid FROM langchain_pg_collection WHERE name = :name"),
+            {"name": plan.collection_name},
+        ).scalar_one()
+        if plan.stale_ids:
+            conn.execute(
+                text("DELETE FROM langchain_pg_embedding WHERE collection_id = :collection_id AND id = ANY(:ids)"),
+                {"collection_id": collection_id, "ids": plan.stale_ids},
+            )
+        if plan.new_chunks:
+            copy_chunks(conn, str(collection_id), plan, vectors)
+
+
+@contextmanager
+def seed_lock():
     """
-    Look for all `cv_??.txt` and `faq_??.txt` files in /data and seed them as separate collections.
+    Postgres advisory lock held while seeding, so only one process (worker or replica)
+    seeds at a time. The others wait, then find the sources already synced.
+    """
+    with engine.connect() as conn:
+        if not conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": SEED_LOCK_KEY}).scalar():
+            logger.info("Another process is seeding, waiting for it to finish...")
+            conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": SEED_LOCK_KEY})
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": SEED_LOCK_KEY})
+
+
+def seed_all_documents_in_data_folder(force: bool = False):
+    """Sync /data into the collections while holding the seed lock."""
+    with seed_lock():
+        sync_data_folder(force)
+
+
+def sync_data_folder(force: bool = False):
+    """
+    Look for all `cv_??.txt` and `faq_??.txt` files in /data and sync them into separate collections.
+    FAQ files are also indexed one question per row (`faq_??_questions`) for direct answers.
+    Unchanged files are skipped; changed files only embed new chunks and drop removed ones.
+    `force` re-embeds every file.
+
+    Files are read and split concurrently, then the new chunks of every file are
+    embedded in `SEED_EMBED_BATCH_SIZE` batches on a shared pool of
+    `SEED_EMBED_CONCURRENCY` workers, and each collection is written with COPY.
     """
     folder = "data"
     pattern = re.compile(r"^(cv|faq)_[a-z]{2}\.txt$", re.IGNORECASE)
@@ -66,24 +340,56 @@ def seed_all_documents_in_data_folder():
         logger.warning("No valid CV or FAQ files found in /data.")
         return
     splitter = RecursiveCharacterTextSplitter(chunk_size=800, chunk_overlap=100)
-    for filename in files:
-        path = os.path.join(folder, filename)
-        collection_name = filename.replace(".txt", "_embeddings")
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                raw_text = f.read()
-
-            if not raw_text.strip():
-                logger.warning("Skipping empty file: %s", filename)
-                continue
-            docs = parse_sections_from_text(raw_text)
-            chunks = splitter.split_documents(docs)
-            logger.info("Seeding %s chunks into collection '%s'...", len(chunks), collection_name)
-            PGVector.from_documents(
-                chunks,
-                embedding=embeddings,
-                collection_name=collection_name,
-                connection=CONNECTION_URI,
-            )
-        except Exception as e:
-            logger.error("Failed to seed %s: %s", filename, e)
+    timer = StageTimer(pipeline="seed")
+
+    def split_sections(raw_text: str) -> List[Document]:
+        return splitter.split_documents(parse_sections_from_text(raw_text))
+
+    # (file, collection, splitter): every file is chunked; FAQ files also get a per-question index
+    sources = [(f, f.replace(".txt", "_embeddings"), split_sections) for f in files]
+    sources += [
+        (f, questions_collection(f[4:6].lower()), parse_faq_entries)
+        for f in files if f.lower().startswith("faq_")
+    ]
+
+    plans: List[SeedPlan] = []
+    with timer.stage("plan"), ThreadPoolExecutor(max_workers=min(len(sources), settings.SEED_EMBED_CONCURRENCY)) as pool:
+        futures = {
+            pool.submit(plan_source, folder, filename, collection_name, split, force): filename
+            for filename, collection_name, split in sources
+        }
+        for future in as_completed(futures):
+            try:
+                plan = future.result()
+                if plan:
+                    plans.append(plan)
+            except Exception as e:
+                logger.error("Failed to seed %s: %s", futures[future], e)
+    if not plans:
+        return
+
+    batch_size = settings.SEED_EMBED_BATCH_SIZE
+    with ThreadPoolExecutor(max_workers=settings.SEED_EMBED_CONCURRENCY) as pool:
+        # Submit every batch of every file up front so they share the worker pool
+        batches = {
+            plan.collection_name: [
+                pool.submit(embed_batch, [c.page_content for c in plan.new_chunks[start:start + batch_size]])
+                for start in range(0, len(plan.new_chunks), batch_size)
+            ]
+            for plan in plans
+        }
+        for plan in plans:
+            try:
+                logger.info("Syncing %s chunks into collection '%s'...", len(plan.chunks), plan.collection_name)
+                with timer.stage("embed"):
+                    vectors = [vector for batch in batches[plan.collection_name] for vector in batch.result()]
+                with timer.stage("write"):
+                    write_collection(plan, vectors)
+                    set_source_hash(plan.collection_name, plan.source_hash)
+                added, removed = len(plan.new_chunks), len(plan.stale_ids)
+                logger.info("Collection '%s' synced: %s added, %s removed.", plan.collection_name, added, removed)
+                if added or removed:
+                    answer_cache.clear(f"Collection '{plan.collection_name}' was reseeded.")
+            except Exception as e:
+                logger.error("Failed to seed %s: %s", plan.filename, e)
+    logger.info("Seeding timings: %s", timer.summary())
@@ -0,0 +1,187 @@
+import threading
+import time
+from typing import List, Optional, Tuple
+import numpy as np
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import JSONB
+from langchain.docstore.document import Document
+from langchain_core.embeddings import Embeddings
+from app.utils.logging.logger import get_logger
+from app.services.answer_cache import answer_cache
+
+
+logger = get_logger("AI Agent")
+
+
+def get_collection_version(engine, name: str) -> Optional[str]:
+    """
+    Fingerprint of a collection's rows (count + hash of ordered ids).
+    Returns None if the collection cannot be read.
+    """
+    try:
+        with engine.connect() as conn:
+            row = conn.execute(
+                text("""
+                    SELECT COUNT(e.id), md5(COALESCE(string_agg(e.id, ',' ORDER BY e.id), ''))
+                    FROM langchain_pg_embedding e
+                    JOIN langchain_pg_collection c ON e.collection_id = c.uuid
+                    WHERE c.name = :name
+                """),
+                {"name": name},
+            ).one()
+            return f"{row[0]}:{row[1]}"
+    except Exception as e:
+        logger.error("Failed to read version of collection '%s': %s", name, str(e).split("\n")[0])
+        return None
+
+
+class InMemoryVectorIndex:
+    """
+    Read-only copy of a pgvector collection held in a contiguous float32 matrix.
+
+    Mirrors the PGVector search API used by the agent and returns cosine
+    distances (lower is better), so it can be swapped in without changes
+    to the callers. Every `refresh_seconds` a background check reloads the
+    collection if its version changed.
+    """
+
+    def __init__(self, engine, collection_name: str, embeddings: Embeddings, refresh_seconds: int = 60):
+        self.engine = engine
+        self.collection_name = collection_name
+        self.embedding_function = embeddings
+        self.refresh_seconds = refresh_seconds
+        self.version: Optional[str] = None
+        self._lock = threading.Lock()
+        self._claim_lock = threading.Lock()
+        self._checked_at = 0.0
+        # (matrix, norms, documents) is swapped as a single reference on reload
+        self._snapshot: Tuple[np.ndarray, np.ndarray, List[Document]] = (
+            np.empty((0, 0), dtype=np.float32),
+            np.empty(0, dtype=np.float32),
+            [],
+        )
+        if engine is not None:
+            self.refresh(force=True)
+
+    @classmethod
+    def from_documents(cls, collection_name: str, documents: List[Document], embeddings: Embeddings) -> "InMemoryVectorIndex":
+        """Index built from documents directly, without Postgres (benchmarks); never refreshed."""
+        index = cls(None, collection_name, embeddings, refresh_seconds=0)
+        vectors = embeddings.embed_documents([doc.page_content for doc in documents]) if documents else []
+        index._set_snapshot(list(documents), vectors, f"{len(documents)}:local")
+        logger.info("In-memory index for '%s' built from %s documents.", collection_name, len(documents))
+        return index
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding_function
+
+    def __len__(self) -> int:
+        return len(self._snapshot[2])
+
+    def documents(self) -> List[Document]:
+        """Documents of the current snapshot, in index order."""
+        return self._snapshot[2]
+
+    def _load(self, version: Optional[str]) -> None:
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                text("""
+                    SELECT e.id, e.document, e.cmetadata, e.embedding
+                    FROM langchain_pg_embedding e
+                    JOIN langchain_pg_collection c ON e.collection_id = c.uuid
+                    WHERE c.name = :name
+                    ORDER BY e.id
+                """).columns(cmetadata=JSONB, embedding=Vector()),
+                {"name": self.collection_name},
+            ).all()
+
+        documents = [
+            Document(id=str(row.id), page_content=row.document or "", metadata=row.cmetadata or {})
+            for row in rows
+        ]
+        self._set_snapshot(documents, [row.embedding for row in rows], version)
+
+    def _set_snapshot(self, documents: List[Document], vectors: List, version: Optional[str]) -> None:
+        if documents:
+            matrix = np.ascontiguousarray(np.vstack(vectors), dtype=np.float32)
+        else:
+            matrix = np.empty((0, 0), dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1) if documents else np.empty(0, dtype=np.float32)
+        norms[norms == 0] = 1.0
+
+        self._snapshot = (matrix, norms, documents)
+        self.version = version
+        logger.info(
+            "In-memory index for '%s' loaded: %s vectors (version %s).",
+            self.collection_name, len(documents), version,
+        )
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Reload the matrix if the collection version changed.
+        Returns True if a reload happened.
+        """
+        with self._lock:
+            self._checked_at = time.monotonic()
+            version = get_collection_version(self.engine, self.collection_name)
+            if not force and (version is None or version == self.version):
+                return False
+            self._load(version)
+            if not force:
+                answer_cache.clear(f"Collection '{self.collection_name}' changed.")
+            return True
+
+    def _refresh_due(self) -> bool:
+        return self.refresh_seconds > 0 and time.monotonic() - self._checked_at >= self.refresh_seconds
+
+    def _refresh_in_background(self) -> None:
+        """
+        If a version check is due, claim it (moving `_checked_at` forward) and run it on a
+        daemon thread. Callers keep searching the current snapshot meanwhile, and only one
+        of them starts the check.
+        """
+        with self._claim_lock:
+            if not self._refresh_due():
+                return
+            self._checked_at = time.monotonic()
+        threading.Thread(target=self._safe_refresh, name=f"refresh-{self.collection_name}", daemon=True).start()
+
+    def _safe_refresh(self) -> None:
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.error("Failed to refresh in-memory index '%s': %s", self.collection_name, str(e).split("\n")[0])
+
+    def _search(self, embedding: List[float], k: int) -> List[Tuple[Document, float]]:
+        matrix, norms, documents = self._snapshot
+        if not documents:
+            return []
+
+        query = np.asarray(embedding, dtype=np.float32)
+        query_norm = float(np.linalg.norm(query))
+        if query_norm == 0:
+            return []
+
+        similarities = (matrix @ query) / (norms * query_norm)
+        k = min(k, len(documents))
+        top = np.argpartition(-similarities, k - 1)[:k]
+        top = top[np.argsort(-similarities[top])]
+        return [(documents[i], float(1.0 - similarities[i])) for i in top]
+
+    def similarity_search_with_score_by_vector(
+        self, embedding: List[float], k: int = 4
+    ) -> List[Tuple[Document, float]]:
+        self._refresh_in_background()
+        return self._search(embedding, k)
+
+    async def asimilarity_search_with_score_by_vector(
+        self, embedding: List[float], k: int = 4
+    ) -> List[Tuple[Document, float]]:
+        # The search is pure NumPy; the (rare) version check runs off the request path
+        self._refresh_in_background()
+        return self._search(embedding, k)
+
+    def similarity_search_with_score(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self.embedding_function.embed_query(query), k=k)
@@ -1,21 +1,24 @@
-import urllib.parse
-from typing import Dict, List
+import hashlib
+from typing import Dict, List, Optional, Union
 import re, os
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 from sqlalchemy.exc import ProgrammingError, OperationalError
-from langchain_openai import OpenAIEmbeddings
 from langchain_postgres.vectorstores import PGVector
 from app.utils.logging.logger import get_logger
+from app.utils.db import engine, async_engine
 from app.config.settings import settings
+from app.utils.embeddings import get_embeddings
 from app.services.seed_documents import seed_all_documents_in_data_folder
+from app.services.vector_index import InMemoryVectorIndex, get_collection_version
+from app.services.answer_cache import answer_cache
+from app.services.faq_index import faq_index, questions_collection
+from app.services.readiness import readiness
+from app.utils.migrations import MIGRATIONS_LOCK_KEY
 
 
 logger = get_logger("AI Agent")
 
-encoded_pass = urllib.parse.quote_plus(settings.POSTGRES_PASSWORD.get_secret_value())
-CONNECTION_URI = f"postgresql+psycopg://{settings.POSTGRES_USER}:{encoded_pass}@{settings.POSTGRES_HOST}:{settings.POSTGRES_PORT}/{settings.POSTGRES_DB}"
-
-embeddings = OpenAIEmbeddings(api_key=settings.OPENAI_API_KEY)
+embeddings = get_embeddings()
 
 
 def discover_collections() -> List[str]:
@@ -43,32 +46,207 @@ def get_collection_count(engine, name: str) -> int:
         return 0
 
 
-def get_all_vector_stores(force: bool = False) -> Dict[str, PGVector]:
-    vector_stores: Dict[str, PGVector] = {}
-    engine = create_engine(CONNECTION_URI, future=True)
+def get_corpus_version(engine, collections: List[str]) -> str:
+    """Combined version of all collections; changes whenever any of them is reseeded."""
+    versions = [f"{name}={get_collection_version(engine, name)}" for name in sorted(collections)]
+    return hashlib.md5(";".join(versions).encode("utf-8")).hexdigest()
+
+
+# Postgres text search configuration per supported language
+TEXT_SEARCH_CONFIGS = {"en": "english", "es": "spanish", "fr": "french"}
+
+
+def hybrid_search_enabled() -> bool:
+    """Full-text search runs in Postgres, so the numpy engine (DB off the read path) skips it."""
+    return settings.HYBRID_SEARCH_ENABLED and settings.RETRIEVAL_ENGINE.lower() != "numpy"
+
+# Rows searched by `retrieval._asearch_pgvector`: document chunks, not the FAQ question
+# rows (which carry their answer and are matched in memory by `faq_index`). The ANN
+# indexes are partial on this predicate and the search repeats it verbatim.
+CHUNK_ROWS = "(cmetadata->>'answer') IS NULL"
+
+ANN_INDEXES = {
+    "hnsw": (
+        "ix_langchain_pg_embedding_chunks_hnsw",
+        "USING hnsw (embedding vector_cosine_ops) WITH (m = {m}, ef_construction = {ef_construction})",
+    ),
+    "ivfflat": (
+        "ix_langchain_pg_embedding_chunks_ivfflat",
+        "USING ivfflat (embedding vector_cosine_ops) WITH (lists = {lists})",
+    ),
+}
+# Earlier full-table ANN indexes (they also covered the FAQ question rows)
+LEGACY_ANN_INDEXES = ["ix_langchain_pg_embedding_embedding_hnsw", "ix_langchain_pg_embedding_embedding_ivfflat"]
+
+
+def ensure_vector_indexes(engine) -> None:
+    """
+    Give `langchain_pg_embedding.embedding` a fixed dimension and index the chunk rows
+    for cosine distance (`settings.VECTOR_ANN_INDEX`), plus a `collection_id` index for
+    the per-collection filter. Idempotent; changing build parameters requires dropping
+    the index by hand.
+
+    pgvector filters by collection after the ANN scan, which loses recall on small
+    tables, so up to `VECTOR_EXACT_SEARCH_MAX_ROWS` chunks no ANN index is kept and
+    searches scan exactly. IVFFlat lists default to rows / 1000 (at least 1).
+    """
+    index_type = settings.VECTOR_ANN_INDEX.lower()
+    dimensions = settings.EMBEDDING_DIMENSIONS
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATIONS_LOCK_KEY})
+            column_type = conn.execute(text("""
+                SELECT format_type(atttypid, atttypmod)
+                FROM pg_attribute
+                WHERE attrelid = 'langchain_pg_embedding'::regclass AND attname = 'embedding'
+            """)).scalar()
+            if column_type == "vector":
+                logger.info("Typing langchain_pg_embedding.embedding as vector(%s).", dimensions)
+                conn.execute(text(f"ALTER TABLE langchain_pg_embedding ALTER COLUMN embedding TYPE vector({int(dimensions)})"))
+            elif column_type != f"vector({dimensions})":
+                logger.error(
+                    "langchain_pg_embedding.embedding is %s but EMBEDDING_DIMENSIONS=%s; skipping vector indexes.",
+                    column_type, dimensions,
+                )
+                return
+
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_langchain_pg_embedding_collection_id "
+                "ON langchain_pg_embedding (collection_id)"
+            ))
+
+            rows = conn.execute(text(f"SELECT COUNT(*) FROM langchain_pg_embedding WHERE {CHUNK_ROWS}")).scalar() or 0
+            if index_type in ANN_INDEXES and rows <= settings.VECTOR_EXACT_SEARCH_MAX_ROWS:
+                logger.info("%s chunk rows: searching exactly, without an ANN index.", rows)
+                index_type = "none"
+
+            for index_name in LEGACY_ANN_INDEXES:
+                conn.execute(text(f"DROP INDEX IF EXISTS {index_name}"))
+            for name, (index_name, _) in ANN_INDEXES.items():
+                if name != index_type:
+                    conn.execute(text(f"DROP INDEX IF EXISTS {index_name}"))
+            if index_type in ANN_INDEXES:
+                index_name, using = ANN_INDEXES[index_type]
+                conn.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS {index_name} ON langchain_pg_embedding "
+                    + using.format(
+                        m=int(settings.HNSW_M),
+                        ef_construction=int(settings.HNSW_EF_CONSTRUCTION),
+                        lists=int(settings.IVFFLAT_LISTS) or max(1, rows // 1000),
+                    )
+                    + f" WHERE {CHUNK_ROWS}"
+                ))
+            elif index_type != "none":
+                logger.warning("Unknown VECTOR_ANN_INDEX '%s'; no ANN index created.", index_type)
+        logger.info("Vector indexes ready (ann=%s, dimensions=%s, chunks=%s).", index_type, dimensions, rows)
+    except (ProgrammingError, OperationalError) as e:
+        logger.error("Failed to create vector indexes: %s", str(e).split("\n")[0])
+
+
+def ensure_text_search_indexes(engine) -> None:
+    """
+    GIN full-text indexes over `langchain_pg_embedding.document`, one per language
+    dictionary. The expressions must match the ones queried in `retrieval.asearch_lexical`.
+    """
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATIONS_LOCK_KEY})
+            for lang, config in TEXT_SEARCH_CONFIGS.items():
+                conn.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS ix_langchain_pg_embedding_fts_{lang} "
+                    f"ON langchain_pg_embedding USING gin (to_tsvector('{config}', document))"
+                ))
+        logger.info("Full-text indexes ready (%s).", ", ".join(TEXT_SEARCH_CONFIGS.values()))
+    except (ProgrammingError, OperationalError) as e:
+        logger.error("Failed to create full-text indexes: %s", str(e).split("\n")[0])
+
+
+VectorStore = Union[PGVector, InMemoryVectorIndex]
+
+
+def load_vector_store(collection_name: str) -> VectorStore:
+    """Build the store for one collection with the configured retrieval engine."""
+    if settings.RETRIEVAL_ENGINE.lower() == "numpy":
+        return InMemoryVectorIndex(
+            engine,
+            collection_name,
+            embeddings,
+            refresh_seconds=settings.VECTOR_INDEX_REFRESH_SECONDS,
+        )
+    # Async-mode store: the /ask path queries it with psycopg's async driver
+    return PGVector(
+        embeddings,
+        collection_name=collection_name,
+        connection=async_engine,
+        async_mode=True,
+        create_extension=False,
+        embedding_length=settings.EMBEDDING_DIMENSIONS,
+    )
+
+
+def get_all_vector_stores(
+    force: bool = False,
+    vector_stores: Optional[Dict[str, VectorStore]] = None,
+) -> Dict[str, VectorStore]:
+    """
+    Seed if needed and load one store per collection.
+    `settings.RETRIEVAL_ENGINE` selects PGVector ("pgvector") or the in-process
+    NumPy index ("numpy"), which keeps the database off the read path.
+
+    Stores are added to `vector_stores` (if given) as soon as they load, so a live
+    dict can start serving queries while seeding is still running. Collections that
+    already hold data are loaded before seeding; progress is tracked in `readiness`.
+    The FAQ question collections are loaded into `faq_index`.
+    """
+    if vector_stores is None:
+        vector_stores = {}
     collections = discover_collections()
     if not collections:
         logger.warning("No CV/FAQ collections discovered in /data.")
+        readiness.set_phase("failed")
         return vector_stores
-    need_seed = force or any(get_collection_count(engine, c) == 0 for c in collections)
-    if need_seed:
-        if force:
-            logger.warning("Force seeding enabled. Reseeding all collections...")
-        else:
-            logger.warning("Some collections are empty. Seeding once...")
-        seed_all_documents_in_data_folder()
     for collection_name in collections:
+        readiness.set_collection(collection_name, "pending")
+
+    def load(collection_name: str) -> None:
         try:
-            vector_stores[collection_name] = PGVector(
-                embeddings,
-                collection_name=collection_name,
-                connection=CONNECTION_URI,
-            )
+            vector_stores[collection_name] = load_vector_store(collection_name)
+            readiness.set_collection(collection_name, "ready")
             logger.info("Collection '%s' loaded into vector store.", collection_name)
         except (ProgrammingError, OperationalError) as e:
+            readiness.set_collection(collection_name, "failed")
             logger.error("Error while loading vector store '%s': %s", collection_name, e)
+
+    empty = [c for c in collections if get_collection_count(engine, c) == 0]
+    faq_languages = [c[4:6] for c in collections if c.startswith("faq_")]
+    faq_missing = settings.FAQ_DIRECT_ANSWER_ENABLED and any(
+        get_collection_count(engine, questions_collection(lang)) == 0 for lang in faq_languages
+    )
+    readiness.set_phase("loading")
+    for collection_name in collections:
+        if collection_name not in empty:
+            load(collection_name)
+
+    if force or empty or faq_missing:
+        if force:
+            logger.warning("Force seeding enabled. Reseeding all collections...")
+        else:
+            logger.warning("Some collections are empty. Seeding once...")
+        readiness.set_phase("seeding")
+        seed_all_documents_in_data_folder(force)
+    ensure_vector_indexes(engine)
+    if hybrid_search_enabled():
+        ensure_text_search_indexes(engine)
+    readiness.set_phase("loading")
+    for collection_name in empty:
+        load(collection_name)
+    faq_index.load(engine, embeddings, faq_languages)
+
+    answer_cache.set_corpus_version(get_corpus_version(engine, collections))
     if not vector_stores:
+        readiness.set_phase("failed")
         logger.warning("No vector stores loaded.")
     else:
+        readiness.set_phase("ready")
         logger.info("Vector stores initialized successfully.")
     return vector_stores
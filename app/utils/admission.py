@@ -0,0 +1,132 @@
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Tuple
+from fastapi import HTTPException
+
+
+def too_many_requests(retry_after: float, detail: str) -> HTTPException:
+    """429 with a whole-second Retry-After (rendered by the error handler)."""
+    return HTTPException(status_code=429, detail=detail, headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+
+
+class TokenBucketLimiter:
+    """
+    Per-client token buckets: each client earns `per_minute` tokens per minute, up to
+    `burst`, and every request spends one. The least recently seen clients are
+    forgotten beyond `max_clients` (they start again with a full bucket).
+    """
+
+    def __init__(self, enabled: bool, per_minute: float, burst: int, max_clients: int):
+        self.enabled = enabled
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self.max_clients = max_clients
+        self.allowed = 0
+        self.limited = 0
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()  # client -> (tokens, updated_at)
+        self._lock = threading.Lock()
+
+    def acquire(self, client: str) -> float:
+        """Spend a token for `client`. Returns 0 if allowed, else the seconds until one is available."""
+        if not self.enabled:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(client, (float(self.burst), now))
+            tokens = min(float(self.burst), tokens + (now - updated_at) * self.rate)
+            allowed = tokens >= 1.0
+            if allowed:
+                tokens -= 1.0
+            self._buckets[client] = (tokens, now)
+            self._buckets.move_to_end(client)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        if allowed:
+            self.allowed += 1
+            return 0.0
+        self.limited += 1
+        return (1.0 - tokens) / self.rate if self.rate > 0 else 60.0
+
+    def check(self, client: str) -> None:
+        """Raise 429 if `client` has no token left."""
+        retry_after = self.acquire(client)
+        if retry_after:
+            raise too_many_requests(retry_after, "Rate limit exceeded. Try again later.")
+
+    def stats(self) -> dict:
+        return {"enabled": self.enabled, "clients": len(self._buckets), "allowed": self.allowed, "limited": self.limited}
+
+
+class AdmissionQueue:
+    """
+    Bounded admission in front of the chat model (one per worker process).
+
+    At most `max_concurrency` calls hold a slot; up to `max_waiting` more wait for one
+    in arrival order, each for at most `max_wait_seconds`. A caller that finds the
+    queue full, or waits too long, gets a 429 whose Retry-After is estimated from the
+    recent time a slot is held and the queue length.
+    """
+
+    def __init__(self, max_concurrency: int, max_waiting: int, max_wait_seconds: float):
+        self.max_concurrency = max_concurrency
+        self.max_waiting = max_waiting
+        self.max_wait_seconds = max_wait_seconds
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.hold_seconds = 1.0  # moving average of the time a slot is held
+        self._slots = asyncio.Semaphore(max_concurrency)
+
+    def _retry_after(self) -> float:
+        return self.hold_seconds * (self.waiting + 1) / self.max_concurrency
+
+    async def acquire(self) -> Callable[[], None]:
+        """
+        Wait for a slot (429 if the queue is full or the wait exceeds `max_wait_seconds`).
+        Returns the function that frees it; calling it more than once is harmless.
+        """
+        if not self._slots.locked():
+            await self._slots.acquire()  # a slot is free: returns without suspending
+        elif self.waiting >= self.max_waiting:
+            self.rejected += 1
+            raise too_many_requests(self._retry_after(), "Server busy. Try again later.")
+        else:
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), timeout=self.max_wait_seconds)
+            except asyncio.TimeoutError:
+                self.timed_out += 1
+                raise too_many_requests(self._retry_after(), "Server busy. Try again later.")
+            finally:
+                self.waiting -= 1
+        self.active += 1
+        self.admitted += 1
+        started = time.monotonic()
+        released = False
+
+        def release() -> None:
+            nonlocal released
+            if released:
+                return
+            released = True
+            self.active -= 1
+            self.hold_seconds += 0.1 * (time.monotonic() - started - self.hold_seconds)
+            self._slots.release()
+
+        return release
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "active": self.active,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "hold_ms_avg": round(self.hold_seconds * 1000, 1),
+        }
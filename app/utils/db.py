@@ -1,6 +1,10 @@
+import threading
 import urllib.parse
-from sqlalchemy import create_engine
+from time import perf_counter
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from app.config.settings import settings
 
 
@@ -10,15 +14,75 @@ DATABASE_URL = (
     f"{settings.POSTGRES_HOST}:{settings.POSTGRES_PORT}/{settings.POSTGRES_DB}"
 )
 
-# SQLAlchemy Base + engine + session factory
-engine = create_engine(
-    DATABASE_URL,
-    echo=False,          # Keep False in production
-    future=True,
-    pool_pre_ping=True,  # Ensures stale connections are recycled automatically
-    pool_size=10,        # Max number of connections in pool
-    max_overflow=20      # Extra connections allowed beyond pool_size
-)
+class PoolMetrics:
+    """Checkout counters and wait times for one connection pool."""
+
+    def __init__(self) -> None:
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, wait_ms: float, timed_out: bool) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_ms_total += wait_ms
+            self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+
+    def stats(self) -> dict:
+        attempts = self.checkouts + self.timeouts
+        return {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_ms_avg": round(self.wait_ms_total / attempts, 2) if attempts else 0.0,
+            "wait_ms_max": round(self.wait_ms_max, 2),
+        }
+
+
+def _timed_get(pool, do_get):
+    started = perf_counter()
+    try:
+        connection = do_get()
+    except exc.TimeoutError:
+        pool.metrics.record((perf_counter() - started) * 1000, timed_out=True)
+        raise
+    pool.metrics.record((perf_counter() - started) * 1000, timed_out=False)
+    return connection
+
+
+# Metrics live on the class so they survive pool.recreate() (e.g. engine.dispose())
+class TimedQueuePool(QueuePool):
+    metrics = PoolMetrics()
+
+    def _do_get(self):
+        return _timed_get(self, super()._do_get)
+
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    metrics = PoolMetrics()
+
+    def _do_get(self):
+        return _timed_get(self, super()._do_get)
+
+
+def _pool_options() -> dict:
+    return {
+        "echo": False,           # Keep False in production
+        "pool_pre_ping": True,   # Ensures stale connections are recycled automatically
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+    }
+
+
+# The only engines in the process: ORM, log writer, counts, seeding and the
+# numpy index share `engine`; async PGVector stores and session reads share `async_engine`.
+engine = create_engine(DATABASE_URL, future=True, poolclass=TimedQueuePool, **_pool_options())
 
 SessionLocal = sessionmaker(
     autocommit=False,
@@ -26,4 +90,43 @@ SessionLocal = sessionmaker(
     bind=engine
 )
 
+# Async engine + session factory for the request path (psycopg3 async driver)
+async_engine = create_async_engine(DATABASE_URL, poolclass=TimedAsyncQueuePool, **_pool_options())
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    expire_on_commit=False
+)
+
+
+def _set_vector_search_params(dbapi_connection, connection_record):
+    """Apply the pgvector query-time knobs (HNSW ef_search / IVFFlat probes) to every new connection."""
+    autocommit = dbapi_connection.autocommit
+    dbapi_connection.autocommit = True  # a SET inside a rolled-back transaction would be undone
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"SET hnsw.ef_search = {int(settings.HNSW_EF_SEARCH)}")
+    cursor.execute(f"SET ivfflat.probes = {int(settings.IVFFLAT_PROBES)}")
+    cursor.close()
+    dbapi_connection.autocommit = autocommit
+
+
+event.listen(engine, "connect", _set_vector_search_params)
+event.listen(async_engine.sync_engine, "connect", _set_vector_search_params)
+
+def pool_status() -> dict:
+    """Current usage and cumulative wait metrics of both pools."""
+    status = {}
+    for name, pool in (("sync", engine.pool), ("async", async_engine.pool)):
+        status[name] = {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+            **pool.metrics.stats(),
+        }
+    return status
+
+
 Base = declarative_base()
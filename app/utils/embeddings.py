@@ -0,0 +1,125 @@
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Iterator, List, Optional, Sequence, Tuple
+from langchain.embeddings import CacheBackedEmbeddings
+from langchain_core.embeddings import Embeddings
+from langchain_core.stores import ByteStore
+from langchain_openai import OpenAIEmbeddings
+from app.config.settings import settings
+from app.utils.fakes import FakeEmbeddings
+from app.utils.logging.logger import get_logger
+
+
+logger = get_logger("Embeddings")
+
+
+class SQLiteLRUByteStore(ByteStore):
+    """
+    Persistent key/value store on a local SQLite file.
+    Holds at most `max_entries` keys; the least recently used ones are evicted first.
+    """
+
+    def __init__(self, path: str, max_entries: int = 10000):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY,"
+            " value BLOB NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_last_access ON cache (last_access)")
+        self._conn.commit()
+
+    def mget(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        rows = {}
+        with self._lock:
+            # Stay below SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                batch = list(keys[start:start + 500])
+                placeholders = ",".join("?" * len(batch))
+                rows.update(self._conn.execute(
+                    f"SELECT key, value FROM cache WHERE key IN ({placeholders})", batch
+                ).fetchall())
+            if rows:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE cache SET last_access = ? WHERE key = ?", [(now, k) for k in rows]
+                )
+                self._conn.commit()
+        return [rows.get(k) for k in keys]
+
+    def mset(self, key_value_pairs: Sequence[Tuple[str, bytes]]) -> None:
+        if not key_value_pairs:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO cache (key, value, last_access) VALUES (?, ?, ?)",
+                [(k, v, now) for k, v in key_value_pairs],
+            )
+            self._evict()
+            self._conn.commit()
+
+    def mdelete(self, keys: Sequence[str]) -> None:
+        with self._lock:
+            self._conn.executemany("DELETE FROM cache WHERE key = ?", [(k,) for k in keys])
+            self._conn.commit()
+
+    def yield_keys(self, *, prefix: Optional[str] = None) -> Iterator[str]:
+        with self._lock:
+            if prefix:
+                rows = self._conn.execute(
+                    "SELECT key FROM cache WHERE substr(key, 1, ?) = ?", (len(prefix), prefix)
+                ).fetchall()
+            else:
+                rows = self._conn.execute("SELECT key FROM cache").fetchall()
+        for (key,) in rows:
+            yield key
+
+    def _evict(self) -> None:
+        count = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM cache WHERE key IN ("
+                " SELECT key FROM cache ORDER BY last_access ASC LIMIT ?)",
+                (overflow,),
+            )
+
+
+@lru_cache(maxsize=1)
+def get_embeddings() -> Embeddings:
+    """
+    Return the shared embeddings client.
+    When `EMBEDDING_CACHE_ENABLED` is set, document and query embeddings are served
+    from an on-disk cache keyed by (model name, sha256 of the text).
+    `EMBEDDING_PROVIDER=fake` swaps in the offline `FakeEmbeddings`.
+    """
+    if settings.EMBEDDING_PROVIDER.lower() == "fake":
+        base = FakeEmbeddings(settings.EMBEDDING_DIMENSIONS, settings.FAKE_EMBEDDING_LATENCY_MS)
+    else:
+        base = OpenAIEmbeddings(api_key=settings.OPENAI_API_KEY)
+    if not settings.EMBEDDING_CACHE_ENABLED:
+        return base
+
+    store = SQLiteLRUByteStore(settings.EMBEDDING_CACHE_PATH, settings.EMBEDDING_CACHE_MAX_ENTRIES)
+    logger.info(
+        "Embedding cache enabled at %s (max %s entries).",
+        settings.EMBEDDING_CACHE_PATH, settings.EMBEDDING_CACHE_MAX_ENTRIES,
+    )
+    return CacheBackedEmbeddings.from_bytes_store(
+        base,
+        store,
+        namespace=f"{base.model}:",
+        query_embedding_cache=True,
+        key_encoder="sha256",
+    )
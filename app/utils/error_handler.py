@@ -16,10 +16,11 @@ def register_exception_handlers(app: FastAPI) -> None:
     and logged with proper severity.
     """
 
-    def error_response(status_code: int, message: str):
+    def error_response(status_code: int, message: str, headers: dict | None = None):
         return JSONResponse(
             status_code=status_code,
-            content=ErrorResponse(error={"code": status_code, "message": message}).dict()
+            content=ErrorResponse(error={"code": status_code, "message": message}).dict(),
+            headers=headers,
         )
 
 
@@ -51,31 +52,33 @@ def register_exception_handlers(app: FastAPI) -> None:
     @app.exception_handler(StarletteHTTPException)
     async def starlette_http_exception_handler(request: Request, exc: StarletteHTTPException):
         code = exc.status_code
+        headers = getattr(exc, "headers", None)  # e.g. Retry-After
         if code == 404:
             logger.warning("Not Found: %s %s", request.method, request.url.path)
-            return error_response(404, "Endpoint not found")
+            return error_response(404, "Endpoint not found", headers)
         elif code == 405:
             logger.warning("Method Not Allowed: %s %s", request.method, request.url.path)
-            return error_response(405, "Method not allowed")
+            return error_response(405, "Method not allowed", headers)
         elif code == 401:
             logger.warning("Unauthorized: %s %s", request.method, request.url.path)
-            return error_response(401, "Authentication required")
+            return error_response(401, "Authentication required", headers)
         elif code == 403:
             logger.warning("Forbidden: %s %s", request.method, request.url.path)
-            return error_response(403, "Access denied")
+            return error_response(403, "Access denied", headers)
         elif code == 413:
             logger.error("Payload too large on %s %s", request.method, request.url.path)
-            return error_response(413, "Request payload too large")
+            return error_response(413, "Request payload too large", headers)
         elif code == 429:
-            logger.warning("Rate limit exceeded on %s %s", request.method, request.url.path)
-            return error_response(429, "Rate limit exceeded. Try again later.")
+            # Rate limit or full model queue: the detail tells them apart
+            logger.warning("Too many requests on %s %s: %s", request.method, request.url.path, exc.detail)
+            return error_response(429, exc.detail, headers)
         elif code == 504:
             logger.error("Gateway timeout on %s %s", request.method, request.url.path)
-            return error_response(504, "Upstream service timed out. Please try again later.")
+            return error_response(504, "Upstream service timed out. Please try again later.", headers)
 
         # fallback for any other HTTP error
         logger.warning(f"HTTP error {code}: {exc.detail}")
-        return error_response(code, exc.detail)
+        return error_response(code, exc.detail, headers)
 
 
     # --- Catch-all ---
@@ -0,0 +1,107 @@
+import asyncio
+import hashlib
+import re
+import time
+from typing import List
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+_BLOCK_HEADER = re.compile(r"^\[source: [^\]]*\]$", re.MULTILINE)
+
+
+def _word_vector(word: str, dimensions: int) -> np.ndarray:
+    seed = int.from_bytes(hashlib.sha256(word.encode("utf-8")).digest()[:8], "little")
+    return np.random.default_rng(seed).standard_normal(dimensions).astype(np.float32)
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Deterministic, offline stand-in for OpenAI embeddings (benchmarks and local runs).
+
+    A text's vector is the normalized sum of per-word random vectors seeded by the
+    word's hash, so texts sharing words are close in cosine distance. Every call
+    sleeps `latency_ms` to mimic the API round-trip.
+    """
+
+    model = "fake"
+
+    def __init__(self, dimensions: int, latency_ms: float = 0.0):
+        self.dimensions = dimensions
+        self.latency_ms = latency_ms
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for word in _WORD.findall(text.lower()):
+            vector += _word_vector(word, self.dimensions)
+        norm = float(np.linalg.norm(vector))
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency_ms / 1000)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        time.sleep(self.latency_ms / 1000)
+        return self._embed(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        await asyncio.sleep(self.latency_ms / 1000)
+        return [self._embed(text) for text in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        await asyncio.sleep(self.latency_ms / 1000)
+        return self._embed(text)
+
+
+class FakeChatModel:
+    """
+    Deterministic, offline stand-in for a chat model with the `invoke` / `ainvoke` /
+    `astream` API the agent uses.
+
+    Answers with the first `answer_tokens` words of the system prompt's context after
+    `latency_ms` (time to first token), then `token_latency_ms` per streamed token.
+    Reports token usage like `stream_usage=True` does.
+    """
+
+    def __init__(self, latency_ms: float = 0.0, token_latency_ms: float = 0.0, answer_tokens: int = 40):
+        self.latency_ms = latency_ms
+        self.token_latency_ms = token_latency_ms
+        self.answer_tokens = answer_tokens
+
+    @staticmethod
+    def _content(message) -> str:
+        return message["content"] if isinstance(message, dict) else message.content
+
+    def _answer(self, messages) -> List[str]:
+        blocks = _BLOCK_HEADER.split(self._content(messages[0]), maxsplit=1) if messages else []
+        context = blocks[1] if len(blocks) > 1 else ""
+        words = _WORD.findall(context)[: self.answer_tokens] or ["No", "context."]
+        return [f"{word} " for word in words]
+
+    def _usage(self, messages, tokens: List[str]) -> dict:
+        prompt_tokens = sum(len(self._content(m)) // 4 for m in messages)
+        return {"input_tokens": prompt_tokens, "output_tokens": len(tokens), "total_tokens": prompt_tokens + len(tokens)}
+
+    def _delay(self, tokens: List[str]) -> float:
+        return (self.latency_ms + self.token_latency_ms * len(tokens)) / 1000
+
+    def invoke(self, messages, **kwargs) -> AIMessage:
+        tokens = self._answer(messages)
+        time.sleep(self._delay(tokens))
+        return AIMessage(content="".join(tokens).strip(), usage_metadata=self._usage(messages, tokens))
+
+    async def ainvoke(self, messages, **kwargs) -> AIMessage:
+        tokens = self._answer(messages)
+        await asyncio.sleep(self._delay(tokens))
+        return AIMessage(content="".join(tokens).strip(), usage_metadata=self._usage(messages, tokens))
+
+    async def astream(self, messages, **kwargs):
+        tokens = self._answer(messages)
+        await asyncio.sleep(self.latency_ms / 1000)
+        for token in tokens:
+            await asyncio.sleep(self.token_latency_ms / 1000)
+            yield AIMessageChunk(content=token)
+        yield AIMessageChunk(content="", usage_metadata=self._usage(messages, tokens))
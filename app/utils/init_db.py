@@ -1,6 +1,7 @@
 from app.utils.db import engine, Base
 from app.models.logs import AgentLog
 from app.utils.logging.logger import get_logger
+from app.utils.migrations import run_migrations
 
 
 logger = get_logger("AI Agent")
@@ -8,6 +9,7 @@ logger = get_logger("AI Agent")
 def init_db():
     try:
         Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
         logger.info("Database initialized successfully.")
     except Exception as e:
         logger.error(f"Database initialization failed: {e}")
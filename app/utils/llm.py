@@ -1,7 +1,16 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Awaitable, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+import httpx
 from langchain_openai import ChatOpenAI
-from langchain_google_genai import ChatGoogleGenerativeAI
 from app.config.settings import settings
+from app.utils.fakes import FakeChatModel
 from app.utils.logging.logger import get_logger
+from app.utils.timing import StageTimer
 
 
 logger = get_logger("LLM")
@@ -17,11 +26,49 @@ class FallbackLLM:
             )
         })()
 
+    async def ainvoke(self, messages, **kwargs):
+        return self.invoke(messages, **kwargs)
 
-def _get_provider_model(provider: str):
+    async def astream(self, messages, **kwargs):
+        yield self.invoke(messages, **kwargs)
+
+
+class ProviderState:
+    """A long-lived chat model plus its circuit-breaker and health state."""
+
+    def __init__(
+        self,
+        name: str,
+        model,
+        http_client: Optional[httpx.Client],
+        http_async_client: Optional[httpx.AsyncClient],
+        probe: Callable[[], Awaitable[object]],
+    ):
+        self.name = name
+        self.model = model
+        self.http_client = http_client
+        self.http_async_client = http_async_client
+        self.probe = probe  # cheap reachability check that uses no tokens
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False  # the half-open trial call is running
+        self.last_check_at: Optional[datetime] = None
+        self.last_ok: Optional[bool] = None
+        self.last_error: Optional[str] = None
+        self.latencies_ms: Deque[float] = deque(maxlen=settings.LLM_HEALTH_LATENCY_WINDOW)
+
+    def is_available(self) -> bool:
+        """Closed circuit, or open circuit whose cooldown elapsed (half-open: one trial call)."""
+        if self.opened_at is None:
+            return True
+        return time.monotonic() - self.opened_at >= settings.LLM_CIRCUIT_COOLDOWN_SECONDS and not self.trial_in_flight
+
+
+def _build_provider(provider: str) -> Optional[ProviderState]:
     """
-    Try to initialize a provider-specific chat model.
-    Returns model instance or None if failed.
+    Initialize a provider-specific chat model with pooled keep-alive HTTP clients
+    ("fake" is the offline benchmark model, see `FakeChatModel`).
+    Returns None if the provider is unsupported or misconfigured.
     """
     provider = provider.lower()
     try:
@@ -29,12 +76,30 @@ def _get_provider_model(provider: str):
             if not settings.OPENAI_API_KEY:
                 logger.warning("OPENAI_API_KEY missing, skipping provider 'openai'.")
                 return None
-            return ChatOpenAI(
+            limits = httpx.Limits(
+                max_connections=settings.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_MAX_CONNECTIONS,
+            )
+            http_client = httpx.Client(limits=limits, timeout=settings.LLM_TIMEOUT_SECONDS)
+            http_async_client = httpx.AsyncClient(limits=limits, timeout=settings.LLM_TIMEOUT_SECONDS)
+            model = ChatOpenAI(
                 api_key=settings.OPENAI_API_KEY,
                 model=settings.OPENAI_MODEL,
                 temperature=0,
                 max_tokens=250,
+                timeout=settings.LLM_TIMEOUT_SECONDS,
+                max_retries=settings.LLM_MAX_RETRIES,
+                stream_usage=True,  # token usage on the last streamed chunk
+                http_client=http_client,
+                http_async_client=http_async_client,
+            )
+            return ProviderState(
+                provider, model, http_client, http_async_client,
+                probe=lambda: model.root_async_client.models.list(),
             )
+        elif provider == "fake":
+            model = FakeChatModel(settings.FAKE_LLM_LATENCY_MS, settings.FAKE_LLM_TOKEN_LATENCY_MS)
+            return ProviderState(provider, model, None, None, probe=lambda: asyncio.sleep(0))
         else:
             logger.warning("Unsupported LLM provider configured: %s", provider)
             return None
@@ -43,16 +108,189 @@ def _get_provider_model(provider: str):
         return None
 
 
+class ProviderRegistry:
+    """
+    Ordered set of chat-model providers built once per process.
+
+    Calls go to the first provider whose circuit is closed. A provider that fails
+    `LLM_CIRCUIT_FAILURE_THRESHOLD` times in a row is skipped for
+    `LLM_CIRCUIT_COOLDOWN_SECONDS`, then given a single trial call.
+    Exposes the same `invoke` / `ainvoke` / `astream` API as a chat model.
+    """
+
+    def __init__(self, providers: List[ProviderState]):
+        self.providers = providers
+        self._lock = threading.Lock()
+
+    def _admit(self, provider: ProviderState) -> Tuple[bool, bool]:
+        """(admitted, trial): closed circuit, or the single trial call of a half-open one."""
+        with self._lock:
+            if not provider.is_available():
+                return False, False
+            trial = provider.opened_at is not None
+            provider.trial_in_flight = provider.trial_in_flight or trial
+            return True, trial
+
+    def _end_trial(self, provider: ProviderState, trial: bool) -> None:
+        """After the trial call, the next one may start once `record_failure` reopened the circuit."""
+        if trial:
+            with self._lock:
+                provider.trial_in_flight = False
+
+    def _candidates(self) -> Iterator[Tuple[ProviderState, bool]]:
+        """(provider, trial) in order, each admitted right before it is tried."""
+        admitted_any = False
+        for provider in self.providers:
+            admitted, trial = self._admit(provider)
+            if admitted:
+                admitted_any = True
+                yield provider, trial
+        if not admitted_any:
+            raise RuntimeError("All LLM providers are unavailable (circuit open).")
+
+    def record_success(self, provider: ProviderState, started: float) -> None:
+        with self._lock:
+            if provider.opened_at is not None:
+                logger.info("LLM provider '%s' recovered.", provider.name)
+            provider.consecutive_failures = 0
+            provider.opened_at = None
+            provider.latencies_ms.append((time.perf_counter() - started) * 1000)
+            provider.last_check_at = datetime.now(timezone.utc)
+            provider.last_ok = True
+            provider.last_error = None
+
+    def record_failure(self, provider: ProviderState, error: Exception) -> None:
+        with self._lock:
+            provider.last_check_at = datetime.now(timezone.utc)
+            provider.last_ok = False
+            provider.last_error = str(error).split("\n")[0]
+            provider.consecutive_failures += 1
+            reopen = provider.opened_at is not None  # failed trial call while half-open
+            if reopen or provider.consecutive_failures >= settings.LLM_CIRCUIT_FAILURE_THRESHOLD:
+                provider.opened_at = time.monotonic()
+                logger.error(
+                    "LLM provider '%s' marked unhealthy after %s failures: %s",
+                    provider.name, provider.consecutive_failures, error,
+                )
+            else:
+                logger.warning("LLM provider '%s' failed: %s", provider.name, error)
+
+    def invoke(self, messages, **kwargs):
+        error: Optional[Exception] = None
+        for provider, trial in self._candidates():
+            started = time.perf_counter()
+            try:
+                result = provider.model.invoke(messages, **kwargs)
+                self.record_success(provider, started)
+                return result
+            except Exception as e:
+                self.record_failure(provider, e)
+                error = e
+            finally:
+                self._end_trial(provider, trial)
+        raise error
+
+    async def ainvoke(self, messages, **kwargs):
+        error: Optional[Exception] = None
+        for provider, trial in self._candidates():
+            started = time.perf_counter()
+            try:
+                result = await provider.model.ainvoke(messages, **kwargs)
+                self.record_success(provider, started)
+                return result
+            except Exception as e:
+                self.record_failure(provider, e)
+                error = e
+            finally:
+                self._end_trial(provider, trial)
+        raise error
+
+    async def astream(self, messages, **kwargs):
+        # Fail over only while nothing has been emitted yet
+        error: Optional[Exception] = None
+        for provider, trial in self._candidates():
+            emitted = False
+            started = time.perf_counter()
+            try:
+                async for chunk in provider.model.astream(messages, **kwargs):
+                    emitted = True
+                    yield chunk
+                self.record_success(provider, started)
+                return
+            except Exception as e:
+                self.record_failure(provider, e)
+                if emitted:
+                    raise
+                error = e
+            finally:
+                self._end_trial(provider, trial)
+        raise error
+
+    async def probe(self) -> None:
+        """
+        Check providers that had no real traffic during the last probe interval.
+        A successful probe also closes an open circuit.
+        """
+        now = datetime.now(timezone.utc)
+        for provider in self.providers:
+            if provider.last_check_at and (now - provider.last_check_at).total_seconds() < settings.LLM_HEALTH_PROBE_INTERVAL_SECONDS:
+                continue
+            started = time.perf_counter()
+            try:
+                await asyncio.wait_for(provider.probe(), timeout=settings.LLM_TIMEOUT_SECONDS)
+                self.record_success(provider, started)
+            except Exception as e:
+                self.record_failure(provider, e)
+
+    def status(self) -> List[dict]:
+        return [
+            {
+                "provider": p.name,
+                "healthy": p.opened_at is None,
+                "consecutive_failures": p.consecutive_failures,
+                "last_check": p.last_check_at.isoformat() if p.last_check_at else None,
+                "last_error": p.last_error,
+                "latency_ms": _latency_percentiles(p.latencies_ms),
+            }
+            for p in self.providers
+        ]
+
+    async def aclose(self) -> None:
+        for provider in self.providers:
+            if provider.http_client:
+                provider.http_client.close()
+            if provider.http_async_client:
+                await provider.http_async_client.aclose()
+
+
+def _latency_percentiles(latencies: Deque[float]) -> Optional[Dict[str, float]]:
+    if not latencies:
+        return None
+    ordered = sorted(latencies)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 1)
+
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99)}
+
+
+@lru_cache(maxsize=1)
+def get_provider_registry() -> ProviderRegistry:
+    """Build the provider registry once per process."""
+    providers = [p for p in (_build_provider(name) for name in settings.LLM_PROVIDERS) if p]
+    if providers:
+        logger.info("LLM providers initialized: %s", [p.name for p in providers])
+    return ProviderRegistry(providers)
+
+
 def get_chat_model():
     """
-    Return the first available chat model.
-    Falls back to FallbackLLM if none available.
+    Return the shared provider registry (used like a chat model).
+    Falls back to FallbackLLM if no provider is configured.
     """
-    for provider in settings.LLM_PROVIDERS:
-        model = _get_provider_model(provider)
-        if model:
-            logger.info("Using LLM provider: %s", provider)
-            return model
+    registry = get_provider_registry()
+    if registry.providers:
+        return registry
 
     logger.error("No valid LLM provider available. Using fallback.")
     return FallbackLLM()
@@ -60,17 +298,34 @@ def get_chat_model():
 
 def get_chat_status() -> dict:
     """
-    Returns provider status in a structured format.
-    Example: {"status": "online", "provider": "openai"}
+    Returns provider status from cached state (background probes + live /ask traffic).
+    Never calls the provider itself.
+    Example: {"status": "online", "provider": "openai", "last_check": "...", "latency_ms": {...}}
     """
-    for provider in settings.LLM_PROVIDERS:
+    registry = get_provider_registry()
+    for provider in registry.providers:
+        if provider.opened_at is None and provider.last_ok:
+            return {
+                "status": "online",
+                "provider": provider.name,
+                "last_check": provider.last_check_at.isoformat(),
+                "latency_ms": _latency_percentiles(provider.latencies_ms),
+            }
+    last_checks = [p.last_check_at for p in registry.providers if p.last_check_at]
+    return {
+        "status": "offline",
+        "provider": "fallback",
+        "last_check": max(last_checks).isoformat() if last_checks else None,
+    }
+
+
+async def run_health_prober() -> None:
+    """Background loop refreshing provider health every `LLM_HEALTH_PROBE_INTERVAL_SECONDS`."""
+    registry = get_provider_registry()
+    while True:
         try:
-            model = _get_provider_model(provider)
-            if not model:
-                continue
-            model.invoke([{"role": "user", "content": "ping"}])
-            return {"status": "online", "provider": provider}
+            with StageTimer(pipeline="health").stage("llm_probe"):
+                await registry.probe()
         except Exception as e:
-            logger.warning("Provider '%s' ping failed: %s", provider, e)
-            continue
-    return {"status": "offline", "provider": "fallback"}
+            logger.error("LLM health probe failed: %s", e)
+        await asyncio.sleep(settings.LLM_HEALTH_PROBE_INTERVAL_SECONDS)
@@ -0,0 +1,14 @@
+import logging
+from contextvars import ContextVar
+
+
+# Set per HTTP request by RequestContextMiddleware; "-" outside a request
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+
+class RequestIdFilter(logging.Filter):
+    """Attach the current request ID to every log record."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
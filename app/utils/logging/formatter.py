@@ -20,4 +20,7 @@ class ColorFormatter(logging.Formatter):
             record.levelname = padded_level
         asctime = self.formatTime(record, "%Y-%m-%d %H:%M").rjust(12).rjust(18)
         message = record.getMessage()
+        request_id = getattr(record, "request_id", "-")
+        if request_id != "-":
+            message = f"[{request_id}] {message}"
         return f"{record.levelname:<8} {asctime} - {record.name} - {message}"
\ No newline at end of file
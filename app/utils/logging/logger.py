@@ -1,6 +1,7 @@
 import sys
 import logging
 from app.utils.logging.formatter import ColorFormatter
+from app.utils.logging.context import RequestIdFilter
 
 
 def get_logger(name: str) -> logging.Logger:
@@ -19,6 +20,7 @@ def get_logger(name: str) -> logging.Logger:
         handler = logging.StreamHandler(sys.stdout)
         formatter = ColorFormatter("%(levelname)s %(asctime)s - %(name)s - %(message)s")
         handler.setFormatter(formatter)
+        handler.addFilter(RequestIdFilter())
         logger.addHandler(handler)
         logger.setLevel(logging.INFO)
 
@@ -0,0 +1,91 @@
+import os
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+from prometheus_client.core import REGISTRY, GaugeMetricFamily
+from app.utils.logging.logger import get_logger
+
+
+logger = get_logger("AI Agent")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route and status.", ["method", "route", "status"]
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route.", ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+STAGE_LATENCY = Histogram(
+    "stage_duration_seconds", "Latency of the named stages of a pipeline (ask, seed, health).",
+    ["pipeline", "stage"], buckets=LATENCY_BUCKETS,
+)
+LLM_TOKENS = Counter("llm_tokens_total", "Tokens reported by the LLM provider.", ["type"])
+PROMPT_TOKENS = Histogram(
+    "ask_prompt_tokens", "Estimated prompt size of /ask calls.",
+    buckets=(250, 500, 1000, 1500, 2000, 3000, 4000, 8000),
+)
+ASK_OUTCOMES = Counter(
+    "ask_outcomes_total", "How /ask requests were answered.", ["outcome"]
+)
+
+
+def record_llm_usage(usage: Optional[dict]) -> None:
+    """Count provider-reported token usage (LangChain `usage_metadata`)."""
+    if not usage:
+        return
+    LLM_TOKENS.labels("prompt").inc(usage.get("input_tokens") or 0)
+    LLM_TOKENS.labels("completion").inc(usage.get("output_tokens") or 0)
+
+
+class StatsCollector:
+    """
+    Exposes the `stats()` dicts of in-process components (caches, log writer, pools)
+    as gauges, read at scrape time: `app_<component>_<key>`.
+    Nested dicts become a label (e.g. the pool name).
+    """
+
+    def __init__(self) -> None:
+        self._sources: List[Tuple[str, Callable[[], dict], Optional[str]]] = []
+
+    def register(self, component: str, stats: Callable[[], dict], label: Optional[str] = None) -> None:
+        self._sources.append((component, stats, label))
+
+    def collect(self):
+        for component, stats, label in self._sources:
+            try:
+                data = stats()
+            except Exception as e:
+                logger.warning("Stats for '%s' unavailable: %s", component, str(e).split("\n")[0])
+                continue
+            rows: Dict[str, List[Tuple[List[str], float]]] = {}
+            groups = data.items() if label else [(None, data)]
+            for group, values in groups:
+                for key, value in values.items():
+                    if isinstance(value, (int, float)):  # bools included; strings and None skipped
+                        rows.setdefault(key, []).append(([group] if label else [], float(value)))
+            for key, samples in rows.items():
+                name = re.sub(r"[^a-zA-Z0-9_]", "_", f"app_{component}_{key}")
+                gauge = GaugeMetricFamily(name, f"{component} {key}", labels=[label] if label else [])
+                for labels, value in samples:
+                    gauge.add_metric(labels, value)
+                yield gauge
+
+
+stats_collector = StatsCollector()
+REGISTRY.register(stats_collector)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """
+    Serialize the registry. In multiprocess mode (`PROMETHEUS_MULTIPROC_DIR`, set by
+    `app.server` for several workers) counters and histograms are aggregated across
+    workers; the component gauges describe the worker serving the scrape.
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(stats_collector)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
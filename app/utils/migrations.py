@@ -0,0 +1,55 @@
+from typing import List, Tuple
+from sqlalchemy import text
+from app.utils.logging.logger import get_logger
+
+
+logger = get_logger("AI Agent")
+
+# Arbitrary key so concurrent processes apply migrations one at a time
+MIGRATIONS_LOCK_KEY = 7415028311
+
+# (version, description, statements) — append only, never edit an applied entry
+MIGRATIONS: List[Tuple[int, str, List[str]]] = [
+    (
+        1,
+        "agent_logs (session_id, created_at DESC) index for session history",
+        [
+            "CREATE INDEX IF NOT EXISTS ix_agent_logs_session_created "
+            "ON agent_logs (session_id, created_at DESC)",
+            # Superseded by the composite index (same leading column)
+            "DROP INDEX IF EXISTS ix_agent_logs_session_id",
+        ],
+    ),
+]
+
+
+def run_migrations(engine) -> None:
+    """
+    Apply pending schema migrations in order, each in its own transaction.
+    Applied versions are recorded in `schema_migrations`.
+    """
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            )
+        """))
+
+    for version, description, statements in MIGRATIONS:
+        with engine.begin() as conn:
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATIONS_LOCK_KEY})
+            applied = conn.execute(
+                text("SELECT 1 FROM schema_migrations WHERE version = :version"),
+                {"version": version},
+            ).scalar()
+            if applied:
+                continue
+            for statement in statements:
+                conn.execute(text(statement))
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, description) VALUES (:version, :description)"),
+                {"version": version, "description": description},
+            )
+            logger.info("Applied migration %s: %s", version, description)
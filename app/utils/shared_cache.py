@@ -0,0 +1,43 @@
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Iterator
+
+
+# Size-bound eviction scans the table, so writers run it once per this many writes
+PRUNE_EVERY_WRITES = 100
+
+
+def connect_shared(path: str) -> sqlite3.Connection:
+    """
+    Open the SQLite file that worker processes share for their caches
+    (`SHARED_CACHE_PATH`). Autocommit mode: writers use `immediate()`.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")  # a cache may lose its last writes on power loss
+    return conn
+
+
+@contextmanager
+def immediate(conn: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+    """Write transaction that takes the file's write lock up front (safe read-modify-write across processes)."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def io_thread(name: str) -> ThreadPoolExecutor:
+    """
+    The single thread that runs a shared cache's SQLite I/O: keeps it (and waits on
+    the file's write lock) off the event loop, and applies one worker's calls in order.
+    """
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
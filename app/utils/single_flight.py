@@ -0,0 +1,51 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, Tuple, TypeVar
+
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls with the same key into one in-progress computation.
+
+    The first caller (leader) starts `fn` as a task; callers arriving while it runs
+    (followers) await the same task. The computation runs to completion even if the
+    leader is cancelled (e.g. its client disconnected). Scope is one event loop,
+    i.e. one worker process.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.leaders = 0
+        self.followers = 0
+        self._calls: Dict[Hashable, "asyncio.Task"] = {}
+
+    async def run(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """Return (result, shared); `shared` is True for followers."""
+        if not self.enabled:
+            return await fn(), False
+        task = self._calls.get(key)
+        if task is not None:
+            self.followers += 1
+            return await asyncio.shield(task), True
+
+        task = asyncio.ensure_future(fn())
+        self._calls[key] = task
+        self.leaders += 1
+        task.add_done_callback(lambda _: self._calls.pop(key, None))
+        return await asyncio.shield(task), False
+
+    def in_flight(self, key: Hashable) -> bool:
+        """Whether `run(key, ...)` would join a running computation (as a follower)."""
+        return self.enabled and key in self._calls
+
+    def stats(self) -> dict:
+        calls = self.leaders + self.followers
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "followers": self.followers,
+            "coalesced_rate": round(self.followers / calls, 4) if calls else 0.0,
+        }
@@ -0,0 +1,47 @@
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Dict, Iterator, Optional
+from app.utils.metrics import STAGE_LATENCY
+
+
+class StageTimer:
+    """
+    Collect wall-clock durations (in milliseconds) for the named stages of a request.
+    Re-entering a stage accumulates its time. Marks record the time elapsed since
+    the timer was created (e.g. time-to-first-token).
+    With a `pipeline` name, every stage and mark is also recorded in the
+    `stage_duration_seconds` histogram.
+    """
+
+    def __init__(self, pipeline: Optional[str] = None) -> None:
+        self.pipeline = pipeline
+        self.started = perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.marks: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (perf_counter() - start) * 1000
+            self.stages[name] = self.stages.get(name, 0.0) + elapsed
+            if self.pipeline:
+                STAGE_LATENCY.labels(self.pipeline, name).observe(elapsed / 1000)
+
+    def mark(self, name: str) -> None:
+        self.marks[name] = (perf_counter() - self.started) * 1000
+        if self.pipeline:
+            STAGE_LATENCY.labels(self.pipeline, name).observe(self.marks[name] / 1000)
+
+    @property
+    def total(self) -> float:
+        return sum(self.stages.values())
+
+    def summary(self) -> str:
+        """Format as `embed=12.3ms search=4.1ms ... total=16.4ms`."""
+        parts = [f"{name}={ms:.1f}ms" for name, ms in self.stages.items()]
+        parts.append(f"total={self.total:.1f}ms")
+        parts.extend(f"{name}@{ms:.1f}ms" for name, ms in self.marks.items())
+        return " ".join(parts)
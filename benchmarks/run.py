@@ -0,0 +1,366 @@
+"""
+Latency / throughput benchmark for /api/v1/ask.
+
+Drives the endpoint at a fixed concurrency and reports p50/p95/p99 latency, RPS and
+the per-stage breakdown scraped from /metrics. Results are written as JSON so runs
+can be compared (`--compare`, `--max-regression`).
+
+Targets:
+  --store memory    in-process app, fake LLM + embeddings, in-memory vector index (no Postgres)
+  --store pgvector  in-process app, fake LLM + embeddings, local Postgres (seeded at start)
+  --url URL         an already running server (configure its providers yourself)
+
+Examples:
+  python -m benchmarks.run --store memory --requests 300 --concurrency 16
+  python -m benchmarks.run --store memory --stream --llm-latency-ms 800 --compare benchmarks/results/baseline.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+import httpx
+from prometheus_client.parser import text_string_to_metric_families
+
+
+RESULTS_DIR = os.path.join("benchmarks", "results")
+
+QUESTIONS = {
+    "en": [
+        "What is Jorge's professional background?",
+        "Which programming languages does he use?",
+        "Where did he study?",
+        "What cloud experience does he have?",
+        "Is he available for remote work?",
+        "What are his salary expectations?",
+        "Tell me about his most recent role.",
+        "Python",
+    ],
+    "es": [
+        "¿Cuál es la experiencia profesional de Jorge?",
+        "¿Qué lenguajes de programación utiliza?",
+        "¿Dónde estudió?",
+        "¿Está disponible para trabajar en remoto?",
+    ],
+    "fr": [
+        "Quelle est l'expérience professionnelle de Jorge ?",
+        "Quels langages de programmation utilise-t-il ?",
+        "Où a-t-il étudié ?",
+        "Est-il disponible pour le télétravail ?",
+    ],
+}
+
+# Settings the in-process targets default to; anything already set in the environment wins
+BENCH_ENV = {
+    "POSTGRES_USER": "postgres",
+    "POSTGRES_PASSWORD": "postgres",
+    "POSTGRES_DB": "ai_agent_bench",
+    "LLM_PROVIDERS": '["fake"]',
+    "EMBEDDING_PROVIDER": "fake",
+    "EMBEDDING_CACHE_ENABLED": "false",
+    "ANSWER_CACHE_ENABLED": "false",
+    "METRICS_ENABLED": "true",
+    "RATE_LIMIT_ENABLED": "false",  # every benchmark request comes from one client
+}
+MEMORY_ENV = {
+    "RETRIEVAL_ENGINE": "numpy",  # also skips the full-text search, which needs Postgres
+}
+APP_LOGGERS = ["AI Agent", "LLM", "Embeddings", "SeedDocuments"]
+REPORTED_SETTINGS = [
+    "LLM_PROVIDERS", "EMBEDDING_PROVIDER", "FAKE_LLM_LATENCY_MS", "FAKE_LLM_TOKEN_LATENCY_MS",
+    "FAKE_EMBEDDING_LATENCY_MS", "RETRIEVAL_ENGINE", "VECTOR_ANN_INDEX", "HYBRID_SEARCH_ENABLED",
+    "ANSWER_CACHE_ENABLED", "EMBEDDING_CACHE_ENABLED", "PROMPT_TOKEN_BUDGET", "RETRIEVAL_MAX_CONCURRENCY",
+    "LLM_MAX_CONCURRENCY", "LLM_QUEUE_MAX_SIZE",
+]
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--store", choices=["memory", "pgvector"], default="memory")
+    target.add_argument("--url", help="Benchmark a running server instead of the in-process app")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=10, help="Requests sent before measuring")
+    parser.add_argument("--language", choices=["en", "es", "fr", "mixed"], default="en")
+    parser.add_argument("--sessions", type=int, default=50, help="Distinct session ids to spread requests over")
+    parser.add_argument("--stream", action="store_true", help="Use /ask/stream (client-side time to first token with --url)")
+    parser.add_argument("--llm-latency-ms", type=float, help="FAKE_LLM_LATENCY_MS for in-process targets")
+    parser.add_argument("--token-latency-ms", type=float, help="FAKE_LLM_TOKEN_LATENCY_MS for in-process targets")
+    parser.add_argument("--embed-latency-ms", type=float, help="FAKE_EMBEDDING_LATENCY_MS for in-process targets")
+    parser.add_argument("--verbose", action="store_true", help="Keep the app's INFO logs")
+    parser.add_argument("--label", default="", help="Name stored in the result and its file name")
+    parser.add_argument("--output", help=f"Result file (default: {RESULTS_DIR}/<timestamp>[-label].json)")
+    parser.add_argument("--compare", help="Previous result file to compare against")
+    parser.add_argument(
+        "--max-regression", type=float,
+        help="Exit with status 1 if p50/p95/p99 grow or RPS drops by more than this percentage vs --compare",
+    )
+    return parser.parse_args(argv)
+
+
+def configure_env(args: argparse.Namespace) -> None:
+    """Point the in-process app at the fake providers (must run before `app` is imported)."""
+    env = dict(BENCH_ENV)
+    if args.store == "memory":
+        env.update(MEMORY_ENV)
+    for key, value in env.items():
+        os.environ.setdefault(key, value)
+    overrides = {
+        "FAKE_LLM_LATENCY_MS": args.llm_latency_ms,
+        "FAKE_LLM_TOKEN_LATENCY_MS": args.token_latency_ms,
+        "FAKE_EMBEDDING_LATENCY_MS": args.embed_latency_ms,
+    }
+    for key, value in overrides.items():
+        if value is not None:
+            os.environ[key] = str(value)
+
+
+def build_memory_stores(vector_stores: dict) -> None:
+    """Split and index the data files (and the FAQ questions) in memory, like seeding does."""
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from app.services.faq_index import faq_index, questions_collection
+    from app.services.prompt_builder import load_encoding
+    from app.services.readiness import readiness
+    from app.services.seed_documents import parse_faq_entries, parse_sections_from_text
+    from app.services.vector_index import InMemoryVectorIndex
+    from app.utils.embeddings import get_embeddings
+
+    load_encoding()
+    splitter = RecursiveCharacterTextSplitter(chunk_size=800, chunk_overlap=100)
+    for filename in sorted(os.listdir("data")):
+        if not filename.endswith(".txt"):
+            continue
+        name = filename.replace(".txt", "_embeddings")
+        with open(os.path.join("data", filename), "r", encoding="utf-8") as f:
+            chunks = splitter.split_documents(parse_sections_from_text(f.read()))
+        vector_stores[name] = InMemoryVectorIndex.from_documents(name, chunks, get_embeddings())
+        readiness.set_collection(name, "ready")
+        if filename.startswith("faq_"):
+            lang = filename[4:6]
+            with open(os.path.join("data", filename), "r", encoding="utf-8") as f:
+                entries = parse_faq_entries(f.read())
+            faq_index.set_index(lang, InMemoryVectorIndex.from_documents(questions_collection(lang), entries, get_embeddings()))
+    readiness.set_phase("ready")
+
+
+def in_process_client(args: argparse.Namespace, sessions: List[str]) -> httpx.AsyncClient:
+    from app.main import app, load_backend
+    from app.services.log_service import log_writer, session_history
+
+    if not args.verbose:
+        for name in APP_LOGGERS:
+            logging.getLogger(name).setLevel(logging.WARNING)
+    app.state.vector_stores = {}
+    if args.store == "memory":
+        build_memory_stores(app.state.vector_stores)
+        log_writer.sink = lambda batch: None
+        for session_id in sessions:
+            session_history.load(session_id, [])  # no stored history to fetch
+    else:
+        load_backend(app.state.vector_stores)
+    transport = httpx.ASGITransport(app=app)
+    return httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120)
+
+
+def question_plan(args: argparse.Namespace, total: int) -> List[dict]:
+    languages = ["en", "es", "fr"] if args.language == "mixed" else [args.language]
+    pool = [(lang, question) for lang in languages for question in QUESTIONS[lang]]
+    return [
+        {"session_id": f"bench-{i % args.sessions}", "question": pool[i % len(pool)][1], "language": pool[i % len(pool)][0]}
+        for i in range(total)
+    ]
+
+
+async def send(client: httpx.AsyncClient, payload: dict, stream: bool) -> dict:
+    started = time.perf_counter()
+    first_token: Optional[float] = None
+    try:
+        if stream:
+            async with client.stream("POST", "/api/v1/ask/stream", json=payload) as response:
+                async for line in response.aiter_lines():
+                    if first_token is None and line.startswith("event: token"):
+                        first_token = time.perf_counter()
+        else:
+            response = await client.post("/api/v1/ask", json=payload)
+        status = str(response.status_code)
+    except httpx.HTTPError as e:
+        status = type(e).__name__
+    finished = time.perf_counter()
+    return {
+        "status": status,
+        "latency_ms": (finished - started) * 1000,
+        "ttft_ms": (first_token - started) * 1000 if first_token else None,
+    }
+
+
+async def drive(client: httpx.AsyncClient, payloads: List[dict], concurrency: int, stream: bool) -> List[dict]:
+    samples: List[dict] = []
+    position = iter(payloads)
+
+    async def worker() -> None:
+        for payload in position:
+            samples.append(await send(client, payload, stream))
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples
+
+
+def percentiles(values: List[float]) -> Optional[Dict[str, float]]:
+    if not values:
+        return None
+    ordered = sorted(values)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 2)
+
+    return {
+        "p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99),
+        "mean": round(sum(ordered) / len(ordered), 2), "max": round(ordered[-1], 2),
+    }
+
+
+def scrape_stages(text: str) -> Dict[str, dict]:
+    """Cumulative `stage_duration_seconds` buckets, sum and count of the ask pipeline, per stage."""
+    stages: Dict[str, dict] = {}
+    for family in text_string_to_metric_families(text):
+        if family.name != "stage_duration_seconds":
+            continue
+        for sample in family.samples:
+            if sample.labels.get("pipeline") != "ask":
+                continue
+            stage = stages.setdefault(sample.labels["stage"], {"buckets": {}, "sum": 0.0, "count": 0.0})
+            if sample.name.endswith("_bucket"):
+                stage["buckets"][float(sample.labels["le"])] = sample.value
+            elif sample.name.endswith("_sum"):
+                stage["sum"] = sample.value
+            elif sample.name.endswith("_count"):
+                stage["count"] = sample.value
+    return stages
+
+
+def _bucket_bound(q: float, buckets: Dict[float, float]) -> Optional[float]:
+    """Upper bound of the histogram bucket holding the q-th observation."""
+    total = max(buckets.values(), default=0)
+    if not total:
+        return None
+    return next(bound for bound in sorted(buckets) if buckets[bound] >= q * total)
+
+
+def stage_breakdown(before: Dict[str, dict], after: Dict[str, dict]) -> Dict[str, dict]:
+    breakdown = {}
+    for stage, end in after.items():
+        start = before.get(stage, {"buckets": {}, "sum": 0.0, "count": 0.0})
+        count = end["count"] - start["count"]
+        if count <= 0:
+            continue
+        buckets = {le: value - start["buckets"].get(le, 0.0) for le, value in end["buckets"].items()}
+        p95 = _bucket_bound(0.95, buckets)
+        breakdown[stage] = {
+            "count": int(count),
+            "mean_ms": round((end["sum"] - start["sum"]) / count * 1000, 2),
+            "p95_le_ms": p95 * 1000 if p95 is not None else None,  # histogram resolution only
+        }
+    return breakdown
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def reported_settings() -> dict:
+    from app.config.settings import settings
+    return {name: getattr(settings, name) for name in REPORTED_SETTINGS}
+
+
+async def run(args: argparse.Namespace) -> dict:
+    payloads = question_plan(args, args.warmup + args.requests)
+    sessions = sorted({payload["session_id"] for payload in payloads})
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=120)
+    else:
+        client = in_process_client(args, sessions)
+
+    async with client:
+        await drive(client, payloads[: args.warmup], args.concurrency, args.stream)
+        before = scrape_stages((await client.get("/metrics")).text)
+        started = time.perf_counter()
+        samples = await drive(client, payloads[args.warmup:], args.concurrency, args.stream)
+        duration = time.perf_counter() - started
+        after = scrape_stages((await client.get("/metrics")).text)
+
+    ok = [s for s in samples if s["status"] == "200"]
+    return {
+        "label": args.label,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": git_commit(),
+        "target": args.url or args.store,
+        "settings": None if args.url else reported_settings(),
+        "requests": len(samples),
+        "concurrency": args.concurrency,
+        "language": args.language,
+        "stream": args.stream,
+        "duration_s": round(duration, 3),
+        "rps": round(len(ok) / duration, 2) if duration else None,
+        "errors": len(samples) - len(ok),
+        "status_codes": dict(Counter(s["status"] for s in samples)),
+        "latency_ms": percentiles([s["latency_ms"] for s in ok]),
+        # The in-process transport buffers the whole body; use the server's first_token stage there
+        "ttft_ms": percentiles([s["ttft_ms"] for s in ok if s["ttft_ms"] is not None]) if args.stream and args.url else None,
+        "stages": stage_breakdown(before, after),
+    }
+
+
+def compare(previous: dict, current: dict, max_regression: Optional[float]) -> bool:
+    """Print the change of the headline numbers. Returns False if one regressed beyond `max_regression` %."""
+    rows = [(f"latency {q}", previous["latency_ms"][q], current["latency_ms"][q], 1) for q in ("p50", "p95", "p99")]
+    rows.append(("rps", previous["rps"], current["rps"], -1))  # lower is worse
+    passed = True
+    print(f"\nvs {previous.get('label') or previous['timestamp']} ({previous.get('commit')}):")
+    for name, old, new, direction in rows:
+        change = (new - old) / old * 100 if old else 0.0
+        regressed = max_regression is not None and change * direction > max_regression
+        passed = passed and not regressed
+        print(f"  {name:<12} {old:>10} -> {new:>10}  {change:+.1f}%{'  REGRESSION' if regressed else ''}")
+    return passed
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    if not args.url:
+        configure_env(args)
+    result = asyncio.run(run(args))
+
+    output = args.output
+    if not output:
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        output = os.path.join(RESULTS_DIR, f"{stamp}{'-' + args.label if args.label else ''}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+
+    print(json.dumps({key: result[key] for key in ("requests", "rps", "errors", "latency_ms", "ttft_ms")}, indent=2))
+    for stage, stats in sorted(result["stages"].items(), key=lambda item: -item[1]["mean_ms"]):
+        print(f"  {stage:<16} mean {stats['mean_ms']:>9} ms   p95 <= {stats['p95_le_ms']} ms   (n={stats['count']})")
+    print(f"Saved {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            if not compare(json.load(f), result, args.max_regression):
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
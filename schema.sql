@@ -40,7 +40,7 @@ ALTER TABLE public.langchain_pg_collection OWNER TO ai_user;
 CREATE TABLE public.langchain_pg_embedding (
     id character varying NOT NULL,
     collection_id uuid,
-    embedding public.vector,
+    embedding public.vector(1536),
     document character varying,
     cmetadata jsonb
 );
@@ -79,6 +79,41 @@ ALTER TABLE ONLY public.langchain_pg_embedding
 CREATE INDEX ix_cmetadata_gin ON public.langchain_pg_embedding USING gin (cmetadata jsonb_path_ops);
 
 
+--
+-- Name: ix_langchain_pg_embedding_chunks_hnsw; Type: INDEX; Schema: public; Owner: ai_user
+--
+
+CREATE INDEX ix_langchain_pg_embedding_chunks_hnsw ON public.langchain_pg_embedding USING hnsw (embedding public.vector_cosine_ops) WITH (m='16', ef_construction='64') WHERE ((cmetadata ->> 'answer'::text) IS NULL);
+
+
+--
+-- Name: ix_langchain_pg_embedding_collection_id; Type: INDEX; Schema: public; Owner: ai_user
+--
+
+CREATE INDEX ix_langchain_pg_embedding_collection_id ON public.langchain_pg_embedding USING btree (collection_id);
+
+
+--
+-- Name: ix_langchain_pg_embedding_fts_en; Type: INDEX; Schema: public; Owner: ai_user
+--
+
+CREATE INDEX ix_langchain_pg_embedding_fts_en ON public.langchain_pg_embedding USING gin (to_tsvector('english'::regconfig, (document)::text));
+
+
+--
+-- Name: ix_langchain_pg_embedding_fts_es; Type: INDEX; Schema: public; Owner: ai_user
+--
+
+CREATE INDEX ix_langchain_pg_embedding_fts_es ON public.langchain_pg_embedding USING gin (to_tsvector('spanish'::regconfig, (document)::text));
+
+
+--
+-- Name: ix_langchain_pg_embedding_fts_fr; Type: INDEX; Schema: public; Owner: ai_user
+--
+
+CREATE INDEX ix_langchain_pg_embedding_fts_fr ON public.langchain_pg_embedding USING gin (to_tsvector('french'::regconfig, (document)::text));
+
+
 --
 -- Name: langchain_pg_embedding langchain_pg_embedding_collection_id_fkey; Type: FK CONSTRAINT; Schema: public; Owner: ai_user
 --
@@ -0,0 +1,17 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Settings the app needs at import time; the unit tests never reach Postgres or OpenAI
+TEST_ENV = {
+    "OPENAI_API_KEY": "test",
+    "POSTGRES_USER": "postgres",
+    "POSTGRES_PASSWORD": "postgres",
+    "POSTGRES_DB": "ai_agent_test",
+    "EMBEDDING_PROVIDER": "fake",
+    "EMBEDDING_CACHE_ENABLED": "false",
+    "SHARED_CACHE_ENABLED": "false",
+}
+for key, value in TEST_ENV.items():
+    os.environ.setdefault(key, value)
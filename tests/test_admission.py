@@ -0,0 +1,87 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from app.utils.admission import AdmissionQueue, TokenBucketLimiter
+
+
+def test_token_bucket_allows_a_burst_then_limits():
+    limiter = TokenBucketLimiter(enabled=True, per_minute=60, burst=2, max_clients=10)
+    assert limiter.acquire("a") == 0
+    assert limiter.acquire("a") == 0
+    retry_after = limiter.acquire("a")
+    assert 0 < retry_after <= 1.0
+    assert limiter.acquire("b") == 0  # buckets are per client
+    assert limiter.stats()["limited"] == 1
+
+
+def test_token_bucket_check_raises_429_with_retry_after():
+    limiter = TokenBucketLimiter(enabled=True, per_minute=1, burst=1, max_clients=10)
+    limiter.check("a")
+    with pytest.raises(HTTPException) as raised:
+        limiter.check("a")
+    assert raised.value.status_code == 429
+    assert int(raised.value.headers["Retry-After"]) >= 1
+
+
+def test_token_bucket_forgets_the_least_recent_clients():
+    limiter = TokenBucketLimiter(enabled=True, per_minute=1, burst=1, max_clients=2)
+    for client in ("a", "b", "c"):
+        limiter.acquire(client)
+    assert limiter.stats()["clients"] == 2
+    assert limiter.acquire("a") == 0  # evicted, so it starts with a full bucket again
+
+
+def test_token_bucket_disabled_never_limits():
+    limiter = TokenBucketLimiter(enabled=False, per_minute=1, burst=1, max_clients=10)
+    assert all(limiter.acquire("a") == 0 for _ in range(5))
+
+
+def test_admission_queue_rejects_when_the_queue_is_full():
+    admission = AdmissionQueue(max_concurrency=1, max_waiting=1, max_wait_seconds=1.0)
+
+    async def main():
+        release = await admission.acquire()
+        waiter = asyncio.create_task(admission.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as raised:
+            await admission.acquire()
+        assert raised.value.status_code == 429
+        release()
+        (await waiter)()
+
+    asyncio.run(main())
+    stats = admission.stats()
+    assert (stats["admitted"], stats["rejected"], stats["active"], stats["waiting"]) == (2, 1, 0, 0)
+
+
+def test_admission_queue_times_out_waiters():
+    admission = AdmissionQueue(max_concurrency=1, max_waiting=5, max_wait_seconds=0.01)
+
+    async def main():
+        release = await admission.acquire()
+        with pytest.raises(HTTPException) as raised:
+            await admission.acquire()
+        assert raised.value.detail == "Server busy. Try again later."
+        release()
+
+    asyncio.run(main())
+    assert admission.stats()["timed_out"] == 1
+    assert admission.stats()["waiting"] == 0
+
+
+def test_admission_release_is_idempotent():
+    admission = AdmissionQueue(max_concurrency=1, max_waiting=0, max_wait_seconds=0.01)
+
+    async def main():
+        release = await admission.acquire()
+        release()
+        release()
+        assert admission.active == 0
+        (await admission.acquire())()
+        # A second release must not have freed an extra slot
+        first = await admission.acquire()
+        with pytest.raises(HTTPException):
+            await admission.acquire()
+        first()
+
+    asyncio.run(main())
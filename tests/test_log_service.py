@@ -0,0 +1,34 @@
+from app.services.log_service import HistoryTurn, _merge_history
+
+
+def turns(*names):
+    return [HistoryTurn(name, f"answer to {name}") for name in names]
+
+
+def test_merge_keeps_unflushed_turns_after_the_newest_db_row():
+    assert _merge_history(turns("a", "b", "c"), turns("a", "b")) == turns("a", "b", "c")
+
+
+def test_merge_with_everything_flushed_adds_nothing():
+    assert _merge_history(turns("a", "b"), turns("a", "b")) == turns("a", "b")
+
+
+def test_merge_keeps_a_repeated_unflushed_turn():
+    assert _merge_history(turns("t", "t"), turns("t")) == turns("t", "t")
+
+
+def test_merge_keeps_repeated_turns_that_are_all_flushed():
+    assert _merge_history(turns("t", "t", "t"), turns("t", "t", "t")) == turns("t", "t", "t")
+
+
+def test_merge_aligns_a_cache_window_on_an_older_db_window():
+    # Both hold the last 3 turns; "d" is not flushed yet
+    assert _merge_history(turns("b", "c", "d"), turns("a", "b", "c")) == turns("a", "b", "c", "d")
+
+
+def test_merge_without_db_history_keeps_the_cache():
+    assert _merge_history(turns("a", "b"), []) == turns("a", "b")
+
+
+def test_merge_without_overlap_keeps_turns_missing_from_the_db():
+    assert _merge_history(turns("x", "a"), turns("a", "b")) == turns("a", "b", "x")
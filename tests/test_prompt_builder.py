@@ -0,0 +1,51 @@
+from langchain.docstore.document import Document
+from app.services.log_service import HistoryTurn
+from app.services.prompt_builder import build_prompt, count_tokens, system_prefix
+
+
+def chunk(text, collection="cv"):
+    return Document(page_content=text, metadata={"collection": collection})
+
+
+def test_prompt_layout():
+    built = build_prompt("en", "What does he do?", [chunk("He builds APIs.")], [HistoryTurn("Hi", "Hello!")])
+    roles = [message["role"] for message in built.messages]
+    assert roles == ["system", "user", "assistant", "user"]
+    assert "[source: cv]\nHe builds APIs." in built.messages[0]["content"]
+    assert built.messages[-1]["content"] == "What does he do?"
+    assert (built.chunks_used, built.turns_used) == (1, 1)
+
+
+def test_the_best_chunk_is_kept_even_over_budget():
+    _, prefix_tokens = system_prefix("en")
+    docs = [chunk("x" * 4000), chunk("short one")]
+    built = build_prompt("en", "q", docs, [], budget=prefix_tokens + 50)
+    assert built.chunks_used == 1
+    assert "x" * 4000 in built.messages[0]["content"]
+
+
+def test_a_less_relevant_chunk_that_fits_is_still_added():
+    _, prefix_tokens = system_prefix("en")
+    docs = [chunk("a" * 400), chunk("b" * 4000), chunk("c" * 40)]
+    built = build_prompt("en", "q", docs, [], budget=prefix_tokens + 200)
+    assert built.chunks_used == 2
+    assert "b" * 4000 not in built.messages[0]["content"]
+
+
+def test_history_keeps_the_newest_turns_and_truncates_the_oldest_that_fits():
+    _, prefix_tokens = system_prefix("en")
+    history = [HistoryTurn("old", "o" * 4000), HistoryTurn("mid", "m" * 400), HistoryTurn("new", "n" * 40)]
+    budget = prefix_tokens + 100
+    built = build_prompt("en", "q", [], history, budget=budget)
+    contents = [message["content"] for message in built.messages[1:-1]]
+    assert contents[0] == "mid" and 0 < len(contents[1]) < 400  # truncated
+    assert contents[2:] == ["new", "n" * 40]
+    assert "old" not in contents
+    assert built.turns_used == 2
+    assert built.prompt_tokens <= budget
+
+
+def test_prompt_tokens_cover_the_question():
+    small = build_prompt("en", "q", [], [])
+    large = build_prompt("en", "q" * 400, [], [])
+    assert large.prompt_tokens - small.prompt_tokens == count_tokens("q" * 400) - count_tokens("q")
@@ -0,0 +1,38 @@
+from langchain.docstore.document import Document
+from app.services.retrieval import LexicalHit, LexicalResult, fuse_rankings
+
+
+def doc(text, collection="cv_en_embeddings"):
+    return Document(page_content=text, metadata={"collection": collection})
+
+
+def hit(text, rank=1.0, exact=True, collection="cv_en_embeddings"):
+    return LexicalHit(doc(text, collection), rank, exact)
+
+
+def test_fusion_ranks_chunks_found_by_both_searches_first():
+    fused = fuse_rankings([doc("a"), doc("b"), doc("c")], [hit("c"), hit("d")], k=2)
+    assert [d.page_content for d in fused] == ["c", "a"]
+
+
+def test_fusion_without_lexical_hits_keeps_the_vector_ranking():
+    vector_docs = [doc("a"), doc("b")]
+    assert fuse_rankings(vector_docs, [], k=1) is vector_docs
+
+
+def test_fast_path_for_rare_exact_terms():
+    lexical = LexicalResult(
+        terms=1,
+        max_term_share=0.01,
+        hits={"cv_en_embeddings": [hit("kubernetes", 0.5)], "faq_en_embeddings": [hit("k8s", 0.9, collection="faq_en_embeddings")]},
+    )
+    docs, source = lexical.fast_path(k=4)
+    assert [d.page_content for d in docs] == ["k8s", "kubernetes"]
+    assert source == "faq_en_embeddings"
+
+
+def test_no_fast_path_for_common_terms_inexact_hits_or_long_questions():
+    assert LexicalResult(terms=1, max_term_share=0.5, hits={"cv": [hit("a")]}).fast_path(k=4) is None
+    assert LexicalResult(terms=1, max_term_share=0.01, hits={"cv": [hit("a", exact=False)]}).fast_path(k=4) is None
+    assert LexicalResult(terms=10, max_term_share=0.01, hits={"cv": [hit("a")]}).fast_path(k=4) is None
+    assert LexicalResult().fast_path(k=4) is None
@@ -0,0 +1,33 @@
+from app.services.seed_documents import parse_faq_entries
+
+FAQ = """### Greetings
+
+* **Q:** Hi / Hello
+  * **A:** Hello! How can I help?
+
+### Work
+
+* **Q:** Where do you work?
+  * **A:** At Acme.
+* **Q:** Orphan question without an answer
+"""
+
+
+def test_one_document_per_question_variant():
+    docs = parse_faq_entries(FAQ)
+    assert [doc.page_content for doc in docs] == ["Hi", "Hello", "Where do you work?"]
+    assert [doc.metadata["entry"] for doc in docs] == [0, 0, 1]
+    assert [doc.metadata["section"] for doc in docs] == ["Greetings", "Greetings", "Work"]
+    assert docs[2].metadata["answer"] == "At Acme."
+
+
+def test_content_hash_covers_question_and_answer():
+    docs = parse_faq_entries(FAQ)
+    edited = parse_faq_entries(FAQ.replace("At Acme.", "At Initech."))
+    assert docs[0].metadata["content_hash"] != docs[1].metadata["content_hash"]
+    assert docs[0].metadata["content_hash"] == edited[0].metadata["content_hash"]
+    assert docs[2].metadata["content_hash"] != edited[2].metadata["content_hash"]
+
+
+def test_text_without_entries_yields_nothing():
+    assert parse_faq_entries("# Title\n\nJust prose.") == []
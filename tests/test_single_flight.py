@@ -0,0 +1,90 @@
+import asyncio
+from app.utils.single_flight import SingleFlight
+
+
+def test_concurrent_calls_with_the_same_key_share_one_computation():
+    flights = SingleFlight()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    async def main():
+        return await asyncio.gather(*(flights.run("key", compute) for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert [result for result, _ in results] == ["answer"] * 5
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+    assert flights.stats()["in_flight"] == 0
+
+
+def test_different_keys_and_later_calls_are_not_shared():
+    flights = SingleFlight()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0)
+        return len(calls)
+
+    async def main():
+        await asyncio.gather(flights.run("a", compute), flights.run("b", compute))
+        return await flights.run("a", compute)
+
+    assert asyncio.run(main()) == (3, False)
+    assert flights.stats()["followers"] == 0
+
+
+def test_in_flight_reports_a_running_key():
+    flights = SingleFlight()
+
+    async def main():
+        started = asyncio.Event()
+
+        async def compute():
+            started.set()
+            await asyncio.sleep(0.01)
+
+        task = asyncio.create_task(flights.run("key", compute))
+        await started.wait()
+        running = flights.in_flight("key"), flights.in_flight("other")
+        await task
+        return running, flights.in_flight("key")
+
+    assert asyncio.run(main()) == ((True, False), False)
+
+
+def test_disabled_runs_every_call():
+    flights = SingleFlight(enabled=False)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+
+    async def main():
+        await asyncio.gather(*(flights.run("key", compute) for _ in range(3)))
+
+    asyncio.run(main())
+    assert len(calls) == 3
+    assert not flights.in_flight("key")
+
+
+def test_the_computation_survives_a_cancelled_leader():
+    flights = SingleFlight()
+
+    async def compute():
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    async def main():
+        leader = asyncio.create_task(flights.run("key", compute))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flights.run("key", compute))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(main()) == ("answer", True)